@@ -0,0 +1,81 @@
+"""Per-call framework overhead of the ape chains, rebuilt per call vs compiled once.
+
+No network access is needed: text apes run against langchain's
+FakeListChatModel, and structured apes only measure the chain setup
+(``with_structured_output`` on a ChatOpenAI with a dummy key), since
+invoking them would need a real endpoint.
+
+	python benchmarks/agent_overhead.py --calls 2000
+"""
+import argparse
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_openai import ChatOpenAI
+
+from apeswarm.agents import AgentRegistry
+from apeswarm.agents.builder_ape import BUILDER_PROMPT, builder_ape_response
+from apeswarm.agents.git_ape import GIT_PROMPT, GitPlan
+from apeswarm.agents.sarcastic_ape import SARCASTIC_PROMPT, sarcastic_ape_response
+from apeswarm.agents.self_edit_ape import SELF_EDIT_PROMPT, SelfEditPlan
+from apeswarm.agents.structured import StructuredChain
+from apeswarm.agents.truth_ape import TRUTH_PROMPT, truth_ape_response
+
+GOAL = "Add a --json flag to the CLI"
+SEARCH_CONTEXT = "src/apeswarm/cli.py:12: parser.add_argument(...)\n" * 20
+
+
+def _per_call_us(fn, calls: int) -> float:
+	started = time.perf_counter()
+	for _ in range(calls):
+		fn()
+	return (time.perf_counter() - started) / calls * 1_000_000
+
+
+def _rebuilt_chain(prompt: ChatPromptTemplate, model):
+	# What every call did before: build the template and the pipe from scratch
+	return ChatPromptTemplate.from_messages(prompt.messages) | model | StrOutputParser()
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--calls", type=int, default=2000)
+	args = parser.parse_args()
+
+	model = FakeListChatModel(responses=["ok"])
+	registry = AgentRegistry()
+	text_apes = {
+		"sarcastic": (
+			SARCASTIC_PROMPT,
+			lambda chain: sarcastic_ape_response(model, GOAL, SEARCH_CONTEXT, chain=chain),
+		),
+		"builder": (
+			BUILDER_PROMPT,
+			lambda chain: builder_ape_response(model, GOAL, "roast", SEARCH_CONTEXT, chain=chain),
+		),
+		"truth": (
+			TRUTH_PROMPT,
+			lambda chain: truth_ape_response(model, GOAL, "plan", SEARCH_CONTEXT, chain=chain),
+		),
+	}
+
+	print(f"{'agent':<12} {'rebuilt/call':>14} {'compiled/call':>14} {'saved':>10}")
+	for name, (prompt, call) in text_apes.items():
+		rebuilt = _per_call_us(lambda: call(_rebuilt_chain(prompt, model)), args.calls)
+		compiled = _per_call_us(lambda: call(registry.chain(name, model)), args.calls)
+		print(f"{name:<12} {rebuilt:>11.1f} us {compiled:>11.1f} us {rebuilt - compiled:>7.1f} us")
+
+	# Structured apes: setup cost alone, which compiled chains pay once per model
+	structured_model = ChatOpenAI(api_key="benchmark", model="gpt-4o")
+	for name, prompt, schema in (("self_edit", SELF_EDIT_PROMPT, SelfEditPlan), ("git", GIT_PROMPT, GitPlan)):
+		setup = _per_call_us(
+			lambda: StructuredChain(ChatPromptTemplate.from_messages(prompt.messages), structured_model, schema),
+			max(1, args.calls // 10),
+		)
+		print(f"{name:<12} {setup:>11.1f} us {0.0:>11.1f} us {setup:>7.1f} us  (setup only)")
+
+
+if __name__ == "__main__":
+	main()
\ No newline at end of file
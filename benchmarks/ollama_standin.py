@@ -0,0 +1,195 @@
+"""A local stand-in for the Ollama HTTP API, and what keep-alive + warm-up save.
+
+The stand-in answers /api/chat and /api/generate like a real server. It
+sleeps ``load_ms`` whenever a model is not loaded, and it honours
+``keep_alive`` the way Ollama does, so model-load latency shows up without
+a GPU or model download. It also records every request body. Use
+``StandInOllama`` as a context manager to check the options apeswarm
+sends (keep_alive, num_ctx, num_thread). Run the script to compare
+per-goal latency with keep-alive off against keep-alive plus warm-up:
+
+	python benchmarks/ollama_standin.py --goals 3 --load-ms 1500
+"""
+import argparse
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import re
+import threading
+import time
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+_DEFAULT_KEEP_ALIVE = 300
+
+
+def _keep_alive_seconds(value) -> float:
+	"""Ollama semantics: seconds or a duration string, negative keeps the model forever."""
+	if value is None:
+		return _DEFAULT_KEEP_ALIVE
+	if isinstance(value, (int, float)):
+		seconds = float(value)
+	else:
+		seconds = 0.0
+		for amount, unit in re.findall(r"(-?\d+(?:\.\d+)?)(ms|s|m|h)?", str(value)):
+			seconds += float(amount) * _DURATION_UNITS[unit or "s"]
+	return float("inf") if seconds < 0 else seconds
+
+
+class StandInOllama:
+	"""Threaded fake Ollama server on a free localhost port."""
+
+	def __init__(self, load_ms: float = 1500, reply: str = "stand-in reply"):
+		self.load_seconds = load_ms / 1000
+		self.reply = reply
+		self.requests: list[tuple[str, dict]] = []
+		self.loads = 0
+		self._loaded: dict[str, float] = {}
+		self._lock = threading.Lock()
+		self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+		self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+	@property
+	def base_url(self) -> str:
+		host, port = self._server.server_address[:2]
+		return f"http://{host}:{port}"
+
+	def __enter__(self):
+		self._thread.start()
+		return self
+
+	def __exit__(self, *exc_info):
+		self._server.shutdown()
+		self._server.server_close()
+
+	def _serve(self, model: str, keep_alive) -> float:
+		"""Load ``model`` if it has expired and return the load time in seconds."""
+		with self._lock:
+			cold = self._loaded.get(model, 0.0) < time.monotonic()
+			if cold:
+				self.loads += 1
+				time.sleep(self.load_seconds)
+			seconds = _keep_alive_seconds(keep_alive)
+			self._loaded[model] = time.monotonic() + seconds if seconds else 0.0
+		return self.load_seconds if cold else 0.0
+
+	def _handler(self):
+		standin = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def log_message(self, *args):
+				pass
+
+			def _send(self, status: int, payloads: list[dict], stream: bool) -> None:
+				self.send_response(status)
+				self.send_header("Content-Type", "application/x-ndjson" if stream else "application/json")
+				self.end_headers()
+				for payload in payloads if stream else payloads[-1:]:
+					self.wfile.write(json.dumps(payload).encode() + b"\n")
+
+			def do_GET(self):
+				if self.path == "/api/ps":
+					now = time.monotonic()
+					models = [{"name": name, "model": name} for name, until in standin._loaded.items() if until >= now]
+					self._send(200, [{"models": models}], stream=False)
+				elif self.path == "/api/version":
+					self._send(200, [{"version": "0.0.0-standin"}], stream=False)
+				else:
+					self._send(404, [{"error": f"not found: {self.path}"}], stream=False)
+
+			def do_POST(self):
+				body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+				standin.requests.append((self.path, body))
+				model = body.get("model", "")
+				created_at = datetime.now(timezone.utc).isoformat()
+				stream = body.get("stream", True)
+				if self.path == "/api/generate":
+					load_seconds = standin._serve(model, body.get("keep_alive"))
+					done_reason = "load" if not body.get("prompt") else "stop"
+					response = "" if done_reason == "load" else standin.reply
+					self._send(
+						200,
+						[{
+							"model": model,
+							"created_at": created_at,
+							"response": response,
+							"done": True,
+							"done_reason": done_reason,
+							"load_duration": int(load_seconds * 1e9),
+						}],
+						stream,
+					)
+				elif self.path == "/api/chat":
+					load_seconds = standin._serve(model, body.get("keep_alive"))
+					chunks = [
+						{
+							"model": model,
+							"created_at": created_at,
+							"message": {"role": "assistant", "content": word},
+							"done": False,
+						}
+						for word in standin.reply.split(" ")
+					]
+					for chunk in chunks[1:]:
+						chunk["message"]["content"] = " " + chunk["message"]["content"]
+					chunks.append(
+						{
+							"model": model,
+							"created_at": created_at,
+							"message": {"role": "assistant", "content": ""},
+							"done": True,
+							"done_reason": "stop",
+							"load_duration": int(load_seconds * 1e9),
+							"prompt_eval_count": sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", [])),
+							"eval_count": len(chunks),
+						}
+					)
+					if not stream:
+						chunks[-1]["message"]["content"] = standin.reply
+					self._send(200, chunks, stream)
+				else:
+					self._send(404, [{"error": f"not found: {self.path}"}], stream=False)
+
+		return Handler
+
+
+def _run_goals(load_ms: float, goals: int, keep_alive: str, warm: bool) -> tuple[float, list[float], int]:
+	from apeswarm.core.model_factory import get_model, warm_up
+
+	with StandInOllama(load_ms=load_ms) as standin:
+		os.environ.update(
+			LLM_PROVIDER="ollama",
+			OLLAMA_BASE_URL=standin.base_url,
+			OLLAMA_KEEP_ALIVE=keep_alive,
+			OLLAMA_WARM_UP="1" if warm else "0",
+		)
+		model = get_model()
+		warm_ms = (warm_up(model) or 0.0) * 1000
+		per_goal = []
+		for _ in range(goals):
+			started = time.perf_counter()
+			# Two ape calls per goal stand in for a pipeline
+			model.invoke("roast this goal")
+			model.invoke("build this goal")
+			per_goal.append((time.perf_counter() - started) * 1000)
+		return warm_ms, per_goal, standin.loads
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--goals", type=int, default=3)
+	parser.add_argument("--load-ms", type=float, default=1500)
+	args = parser.parse_args()
+
+	print(f"{'setting':<28} {'warm-up':>9} " + " ".join(f"{f'goal {i + 1}':>9}" for i in range(args.goals)) + "  loads")
+	for label, keep_alive, warm in (
+		("keep_alive=0, no warm-up", "0", False),
+		("keep_alive=30m, warm-up", "30m", True),
+	):
+		warm_ms, per_goal, loads = _run_goals(args.load_ms, args.goals, keep_alive, warm)
+		goals = " ".join(f"{ms:>6.0f} ms" for ms in per_goal)
+		print(f"{label:<28} {warm_ms:>6.0f} ms {goals}  {loads:>5}")
+
+
+if __name__ == "__main__":
+	main()
\ No newline at end of file
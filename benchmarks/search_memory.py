@@ -0,0 +1,95 @@
+"""Peak RSS of repo search on a pathological tree: whole-file reads vs capped line streaming.
+
+It builds a throwaway repo with one huge generated module, one huge
+single-line minified file and a few normal files. Each strategy then
+runs in a fresh subprocess, and the script reports how far the search
+pushed that process's peak RSS.
+
+	python benchmarks/search_memory.py --size-mb 200
+"""
+import argparse
+from pathlib import Path
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+GOAL = "harden the webhook retry scheduler"
+
+
+def _read_text_search(repo_root: Path) -> str:
+	# Previous behaviour: read_text() + splitlines() on every file
+	from apeswarm.core.search import _collect_hits, _extract_keywords, iter_repo_files
+
+	keywords = _extract_keywords(GOAL)
+	hits: list[str] = []
+	for file_path in iter_repo_files(repo_root):
+		content = file_path.read_text(encoding="utf-8", errors="ignore")
+		_collect_hits(str(file_path.relative_to(repo_root)), content.splitlines(), keywords, hits, 20)
+	return "\n".join(hits)
+
+
+def _streaming_search(repo_root: Path) -> str:
+	from apeswarm.core.search import collect_repo_context
+
+	return collect_repo_context(goal=GOAL, repo_root=repo_root)
+
+
+_STRATEGIES = {"read_text": _read_text_search, "streaming": _streaming_search}
+
+
+def _build_repo(root: Path, size_mb: int) -> None:
+	(root / "src").mkdir()
+	(root / "src" / "scheduler.py").write_text("def schedule_retry(webhook):\n\treturn webhook\n")
+	(root / "README.md").write_text("# Demo\n\nWebhook retry scheduler notes.\n")
+	line = "GENERATED_TABLE_ENTRY = (0x0, 0x1, 0x2, 0x3, 0x4, 0x5, 0x6, 0x7)\n"
+	chunk = line * (1024 * 1024 // len(line))
+	with (root / "src" / "generated_tables.py").open("w") as handle:
+		for _ in range(size_mb):
+			handle.write(chunk)
+	block = "var a=function(b){return b+1};" * (1024 * 1024 // 31)
+	with (root / "bundle.min.txt").open("w") as handle:
+		for _ in range(size_mb):
+			handle.write(block)
+
+
+def _child(strategy: str, repo_root: Path) -> None:
+	before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	started = time.perf_counter()
+	hits = _STRATEGIES[strategy](repo_root)
+	elapsed = time.perf_counter() - started
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# ru_maxrss is KiB on Linux, bytes on macOS
+	scale = 1 if sys.platform == "darwin" else 1024
+	print(f"{(peak - before) * scale / 2**20:.1f} {elapsed:.2f} {len(hits.splitlines())}")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--size-mb", type=int, default=200, help="Size of each pathological file")
+	parser.add_argument("--child", choices=sorted(_STRATEGIES), help=argparse.SUPPRESS)
+	parser.add_argument("--repo", type=Path, help=argparse.SUPPRESS)
+	args = parser.parse_args()
+	if args.child:
+		_child(args.child, args.repo)
+		return
+
+	with tempfile.TemporaryDirectory() as tmp:
+		repo_root = Path(tmp)
+		_build_repo(repo_root, args.size_mb)
+		print(f"{args.size_mb} MB generated module + {args.size_mb} MB single-line bundle")
+		print(f"{'strategy':<12} {'peak RSS growth':>16} {'time':>8} {'hits':>5}")
+		for strategy in _STRATEGIES:
+			output = subprocess.run(
+				[sys.executable, __file__, "--child", strategy, "--repo", str(repo_root)],
+				check=True,
+				capture_output=True,
+				text=True,
+			).stdout.split()
+			growth, elapsed, hits = output
+			print(f"{strategy:<12} {float(growth):>13.1f} MB {float(elapsed):>6.2f} s {hits:>5}")
+
+
+if __name__ == "__main__":
+	main()
\ No newline at end of file
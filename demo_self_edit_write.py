@@ -52,16 +52,21 @@ def process_data(items):
 	
 	# Apply the patches
 	print("\n⚙️  Applying patches...")
-	patch_count, applied_files = apply_self_edit_patches(
+	patch_result = apply_self_edit_patches(
 		self_edit_output=self_edit_output,
 		repo_root=Path.cwd(),
 		model=None,
 	)
+	patch_count = patch_result["applied_count"]
 	
 	print(f"\n✅ Applied {patch_count} patches:\n")
-	for file in applied_files:
+	for file in patch_result["modified_files"]:
 		print(f"   - {file}")
 	
+	print("\n⏱️  Per-file timing:")
+	for timing in patch_result["timings"]:
+		print(f"   - {timing['file']}: {timing['transform_ms']} ms transform, {timing['write_ms']} ms write")
+	
 	# Check if file was modified
 	modified_content = test_file.read_text()
 	print(f"\nModified content:\n{modified_content}\n")
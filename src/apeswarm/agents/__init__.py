@@ -1,13 +1,27 @@
-from .builder_ape import builder_ape_response
-from .git_ape import git_ape_response
+from .builder_ape import builder_ape_candidates, builder_ape_response
+from .git_ape import DEFAULT_GIT_PLAN, GitPlan, git_ape_response
+from .patch_ape import PatchBatch, patch_ape_response
+from .registry import AGENT_CHAIN_FACTORIES, AgentRegistry
 from .sarcastic_ape import sarcastic_ape_response
-from .self_edit_ape import self_edit_ape_response
-from .truth_ape import truth_ape_response
+from .self_edit_ape import PatchTarget, SelfEditPlan, self_edit_ape_response
+from .truth_ape import CandidateVerdict, truth_ape_has_handoff, truth_ape_pick_candidate, truth_ape_response
 
 __all__ = [
 	"sarcastic_ape_response",
 	"builder_ape_response",
+	"builder_ape_candidates",
 	"truth_ape_response",
+	"truth_ape_pick_candidate",
+	"truth_ape_has_handoff",
 	"self_edit_ape_response",
 	"git_ape_response",
+	"patch_ape_response",
+	"PatchBatch",
+	"CandidateVerdict",
+	"GitPlan",
+	"DEFAULT_GIT_PLAN",
+	"PatchTarget",
+	"SelfEditPlan",
+	"AgentRegistry",
+	"AGENT_CHAIN_FACTORIES",
 ]
\ No newline at end of file
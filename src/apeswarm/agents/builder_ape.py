@@ -1,24 +1,58 @@
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda, RunnableParallel
 
+from .shared_prefix import shared_prefix_messages
 
-def builder_ape_response(model, goal: str, sarcastic_context: str) -> str:
-	prompt = ChatPromptTemplate.from_messages(
-		[
-			(
-				"system",
-				"""You are BuilderApe in ApeSwarm.
+BUILDER_PROMPT = ChatPromptTemplate.from_messages(
+	[
+		MessagesPlaceholder("prefix"),
+		(
+			"system",
+			"""You are BuilderApe in ApeSwarm.
 Convert strategy into practical implementation output.
 Produce concise markdown with sections exactly:
 1) Build Plan
 2) Proposed File Changes
 3) Handoff to GitApe""",
-			),
-			(
-				"human",
-				"Goal:\n{goal}\n\nSarcasticApe Guidance:\n{sarcastic_context}",
-			),
-		]
+		),
+		(
+			"human",
+			"SarcasticApe Guidance:\n{sarcastic_context}",
+		),
+	]
+)
+
+
+def builder_ape_chain(model):
+	return BUILDER_PROMPT | model | StrOutputParser()
+
+
+def builder_ape_response(model, goal: str, sarcastic_context: str, search_context: str = "", chain=None) -> str:
+	chain = chain or builder_ape_chain(model)
+	return chain.invoke(
+		{
+			"prefix": shared_prefix_messages(model, goal, search_context),
+			"sarcastic_context": sarcastic_context,
+		}
 	)
-	chain = prompt | model | StrOutputParser()
-	return chain.invoke({"goal": goal, "sarcastic_context": sarcastic_context})
\ No newline at end of file
+
+
+def builder_ape_candidates(
+	models: list,
+	goal: str,
+	sarcastic_context: str,
+	search_context: str = "",
+	chains: list | None = None,
+) -> list[str]:
+	"""Generate one candidate plan per model, all requests in flight concurrently."""
+	chains = chains or [builder_ape_chain(model) for model in models]
+	branches = {}
+	for index, (model, chain) in enumerate(zip(models, chains)):
+		# Candidates may target different providers, so each wraps the prefix for its own model
+		prefix = shared_prefix_messages(model, goal, search_context)
+		branches[f"candidate_{index}"] = (
+			RunnableLambda(lambda inputs, prefix=prefix: {**inputs, "prefix": prefix}) | chain
+		)
+	outputs = RunnableParallel(branches).invoke({"sarcastic_context": sarcastic_context})
+	return [outputs[f"candidate_{index}"] for index in range(len(models))]
\ No newline at end of file
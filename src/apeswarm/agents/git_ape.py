@@ -1,26 +1,86 @@
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
+import re
 
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from pydantic import BaseModel, Field, field_validator
 
-def git_ape_response(model, goal: str, builder_output: str) -> str:
-	prompt = ChatPromptTemplate.from_messages(
-		[
-			(
-				"system",
-				"""You are GitApe in ApeSwarm.
+from .shared_prefix import shared_prefix_messages
+from .structured import StructuredChain
+
+
+class GitPlan(BaseModel):
+	branch_name: str = Field(description="Git branch name, e.g. feat/short-topic (letters, digits, . _ / - only)")
+	commit_message: str = Field(description="Conventional commit subject line")
+	pr_title: str
+	merge_checklist: list[str] = Field(default_factory=list)
+
+	@field_validator("branch_name")
+	@classmethod
+	def _sanitize_branch(cls, value: str) -> str:
+		branch = re.sub(r"[^a-zA-Z0-9._/-]+", "-", value.strip()).strip("-/.")
+		if not branch:
+			raise ValueError("branch_name is empty after removing characters git does not allow")
+		return branch
+
+	@field_validator("commit_message", "pr_title")
+	@classmethod
+	def _require_text(cls, value: str) -> str:
+		value = value.strip()
+		if not value:
+			raise ValueError("must not be empty")
+		return value
+
+	def to_markdown(self) -> str:
+		checklist = "\n".join(f"- [ ] {item}" for item in self.merge_checklist) or "- [ ] Review diff"
+		return (
+			f"1) Branch Name: {self.branch_name}\n\n"
+			f"2) Commit Message: {self.commit_message}\n\n"
+			f"3) PR Title: {self.pr_title}\n\n"
+			f"4) Merge Checklist\n{checklist}"
+		)
+
+
+# Used when GitApe cannot produce a valid plan within its repair budget
+DEFAULT_GIT_PLAN = GitPlan(
+	branch_name="feat/git-ape-auto-plan",
+	commit_message="chore: apply gitape planned updates",
+	pr_title="chore: apply gitape planned updates",
+)
+
+
+GIT_PROMPT = ChatPromptTemplate.from_messages(
+	[
+		MessagesPlaceholder("prefix"),
+		(
+			"system",
+			"""You are GitApe in ApeSwarm.
 You are responsible for git strategy and delivery hygiene.
 Do not repeat BuilderApe or SarcasticApe text.
-Respond with concise markdown sections exactly:
-1) Branch Name
-2) Commit Message
-3) PR Title
-4) Merge Checklist""",
-			),
-			(
-				"human",
-				"Goal:\n{goal}\n\nBuilderApe Output:\n{builder_output}",
-			),
-		]
-	)
-	chain = prompt | model | StrOutputParser()
-	return chain.invoke({"goal": goal, "builder_output": builder_output})
\ No newline at end of file
+Return a branch name, a commit message, a PR title and a short merge checklist.""",
+		),
+		(
+			"human",
+			"BuilderApe Output:\n{builder_output}",
+		),
+	]
+)
+
+
+def git_ape_chain(model) -> StructuredChain:
+	return StructuredChain(GIT_PROMPT, model, GitPlan)
+
+
+def git_ape_response(
+	model,
+	goal: str,
+	builder_output: str,
+	search_context: str = "",
+	chain: StructuredChain | None = None,
+) -> GitPlan:
+	chain = chain or git_ape_chain(model)
+	return chain.invoke(
+		{
+			# One GitApe call per run: a cache breakpoint would only be written
+			"prefix": shared_prefix_messages(model, goal, search_context, cache=False),
+			"builder_output": builder_output,
+		}
+	)
\ No newline at end of file
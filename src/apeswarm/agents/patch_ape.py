@@ -0,0 +1,59 @@
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
+
+from .structured import StructuredChain
+
+
+class SearchReplaceEdit(BaseModel):
+	search: str = Field(description="Exact snippet copied from the current file content; must occur exactly once")
+	replace: str = Field(description="Text that replaces the snippet")
+
+
+class FilePatch(BaseModel):
+	path: str = Field(description="File path exactly as given in the request")
+	edits: list[SearchReplaceEdit] = Field(default_factory=list)
+
+
+class PatchBatch(BaseModel):
+	files: list[FilePatch] = Field(default_factory=list)
+
+
+PATCH_PROMPT = ChatPromptTemplate.from_messages(
+	[
+		(
+			"system",
+			"""You are PatchApe in ApeSwarm.
+You turn approved self-edit targets into minimal, safe file edits.
+For each file, return search/replace edits only:
+- search must be copied verbatim from the current content and be unique in it
+- keep edits small; never rewrite whole files
+- Python files must stay syntactically valid
+Return an entry only for files you actually change.""",
+		),
+		("human", "{targets}"),
+	]
+)
+
+
+def _format_patch_targets(targets: list[tuple[str, list[str], str]]) -> str:
+	sections = []
+	for path, actions, content in targets:
+		requested = "\n".join(f"- {action}" for action in actions)
+		sections.append(
+			f"### File: {path}\nRequested changes:\n{requested}\nCurrent content:\n<<<\n{content}\n>>>"
+		)
+	return "\n\n".join(sections)
+
+
+def patch_ape_chain(model) -> StructuredChain:
+	return StructuredChain(PATCH_PROMPT, model, PatchBatch)
+
+
+def patch_ape_response(
+	model,
+	targets: list[tuple[str, list[str], str]],
+	chain: StructuredChain | None = None,
+) -> PatchBatch:
+	"""Request search/replace edits for every (path, actions, content) target in one call."""
+	chain = chain or patch_ape_chain(model)
+	return chain.invoke({"targets": _format_patch_targets(targets)})
\ No newline at end of file
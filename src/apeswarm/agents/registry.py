@@ -0,0 +1,47 @@
+from typing import Callable
+
+from .builder_ape import builder_ape_chain
+from .git_ape import git_ape_chain
+from .patch_ape import patch_ape_chain
+from .sarcastic_ape import sarcastic_ape_chain
+from .self_edit_ape import self_edit_ape_chain
+from .truth_ape import truth_ape_chain, truth_ape_pick_chain
+
+# Agent name -> factory that wires the agent's module-level prompt to a model
+AGENT_CHAIN_FACTORIES: dict[str, Callable] = {
+	"sarcastic": sarcastic_ape_chain,
+	"builder": builder_ape_chain,
+	"truth": truth_ape_chain,
+	"truth_pick": truth_ape_pick_chain,
+	"self_edit": self_edit_ape_chain,
+	"git": git_ape_chain,
+	"patch": patch_ape_chain,
+}
+
+
+class AgentRegistry:
+	"""Agent runnables compiled once per model and reused for every call.
+
+	Prompt templates are module constants, so compiling is only the
+	``prompt | model | parser`` wiring (plus ``with_structured_output`` for
+	schema-bound apes). Models are keyed by identity and kept alive by the
+	registry, so it should live as long as the models it compiles for.
+	"""
+
+	def __init__(self, factories: dict[str, Callable] | None = None):
+		self.factories = dict(factories or AGENT_CHAIN_FACTORIES)
+		self._compiled: dict[tuple[str, int], tuple[object, object]] = {}
+
+	def chain(self, name: str, model):
+		"""Return ``name``'s runnable for ``model``, building it on first use."""
+		key = (name, id(model))
+		entry = self._compiled.get(key)
+		if entry is None or entry[0] is not model:
+			entry = (model, self.factories[name](model))
+			self._compiled[key] = entry
+		return entry[1]
+
+	def compile(self, model, names: list[str] | None = None) -> None:
+		"""Build runnables ahead of time so no call pays for the wiring."""
+		for name in names or self.factories:
+			self.chain(name, model)
\ No newline at end of file
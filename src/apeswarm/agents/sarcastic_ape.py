@@ -1,22 +1,30 @@
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
+from .shared_prefix import shared_prefix_messages
 
-def sarcastic_ape_response(model, goal: str) -> str:
-	prompt = ChatPromptTemplate.from_messages(
-		[
-			(
-				"system",
-				"""You are SarcasticApe, founder of ApeSwarm.
+SARCASTIC_PROMPT = ChatPromptTemplate.from_messages(
+	[
+		MessagesPlaceholder("prefix"),
+		(
+			"system",
+			"""You are SarcasticApe, founder of ApeSwarm.
 Maximum sarcasm. Zero tolerance for mediocre ideas.
 Roast the goal if needed, then route execution for shipping.
 Return concise sections exactly:
 1) Roast
 2) Strategy
 3) Handoff to BuilderApe""",
-			),
-			("human", "Goal: {goal}"),
-		]
-	)
-	chain = prompt | model | StrOutputParser()
-	return chain.invoke({"goal": goal})
\ No newline at end of file
+		),
+		("human", "Roast and route the goal above."),
+	]
+)
+
+
+def sarcastic_ape_chain(model):
+	return SARCASTIC_PROMPT | model | StrOutputParser()
+
+
+def sarcastic_ape_response(model, goal: str, search_context: str = "", chain=None) -> str:
+	chain = chain or sarcastic_ape_chain(model)
+	return chain.invoke({"prefix": shared_prefix_messages(model, goal, search_context)})
\ No newline at end of file
@@ -1,26 +1,96 @@
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
+from pathlib import PurePosixPath
 
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from pydantic import BaseModel, Field, field_validator
 
-def self_edit_ape_response(model, goal: str, truth_output: str, iterations: int) -> str:
-	prompt = ChatPromptTemplate.from_messages(
-		[
-			(
-				"system",
-				"""You are SelfEditApe in ApeSwarm.
+from .shared_prefix import shared_prefix_messages
+from .structured import StructuredChain
+
+
+class PatchTarget(BaseModel):
+	path: str = Field(description="Repository-relative file path, e.g. src/apeswarm/cli.py")
+	action: str = Field(description="One concrete change, e.g. 'Add docstrings to public functions'")
+
+	@field_validator("path")
+	@classmethod
+	def _relative_path(cls, value: str) -> str:
+		path = value.strip().strip("`").removeprefix("./")
+		pure = PurePosixPath(path)
+		if not path or pure.is_absolute() or ".." in pure.parts:
+			raise ValueError(f"path must be repository-relative without '..': {value!r}")
+		return path
+
+
+class SelfEditPlan(BaseModel):
+	loop_plan: str = Field(description="Short markdown plan for this self-edit iteration")
+	patch_targets: list[PatchTarget] = Field(default_factory=list)
+	safety_guardrails: list[str] = Field(default_factory=list)
+	handoff: str = Field(default="", description="Handoff note for GitApe")
+
+	def to_markdown(self) -> str:
+		targets = "\n".join(
+			f"{index}. {target.path}: {target.action}" for index, target in enumerate(self.patch_targets, start=1)
+		) or "- None"
+		guardrails = "\n".join(f"- {item}" for item in self.safety_guardrails) or "- None"
+		return (
+			f"## Self-Edit Loop Plan\n{self.loop_plan}\n\n"
+			f"## Patch Targets\n{targets}\n\n"
+			f"## Safety Guardrails\n{guardrails}\n\n"
+			f"## Handoff to GitApe\n{self.handoff}"
+		)
+
+
+SELF_EDIT_PROMPT = ChatPromptTemplate.from_messages(
+	[
+		MessagesPlaceholder("prefix"),
+		(
+			"system",
+			"""You are SelfEditApe in ApeSwarm.
 You design safe self-improvement loops for the repository.
 Do not pretend files were modified.
-Return concise markdown sections exactly:
-1) Self-Edit Loop Plan
-2) First Iteration Patch Targets
-3) Safety Guardrails
-4) Handoff to GitApe""",
-			),
-			(
-				"human",
-				"Goal:\n{goal}\n\nTruthApe Findings:\n{truth_output}\n\nRequested Iterations: {iterations}",
-			),
-		]
-	)
-	chain = prompt | model | StrOutputParser()
-	return chain.invoke({"goal": goal, "truth_output": truth_output, "iterations": iterations})
\ No newline at end of file
+Return a short loop plan, concrete patch targets (repository-relative path
+plus one action each), safety guardrails and a handoff note for GitApe.""",
+		),
+		(
+			"human",
+			"{findings_label}:\n{findings}\n\nIteration: {iteration} of {iterations}",
+		),
+	]
+)
+
+
+def self_edit_ape_chain(model) -> StructuredChain:
+	return StructuredChain(SELF_EDIT_PROMPT, model, SelfEditPlan)
+
+
+def self_edit_ape_response(
+	model,
+	goal: str,
+	truth_output: str,
+	iterations: int,
+	iteration: int = 1,
+	feedback: str = "",
+	search_context: str = "",
+	chain: StructuredChain | None = None,
+) -> SelfEditPlan:
+	"""Plan one self-edit iteration.
+
+	The first iteration works from TruthApe's findings; later ones only get
+	the compact feedback from the previous iteration, so the prompt does not
+	grow with the iteration count.
+	"""
+	if feedback:
+		findings_label, findings = "Previous Iteration Feedback", feedback
+	else:
+		findings_label, findings = "TruthApe Findings", truth_output
+	chain = chain or self_edit_ape_chain(model)
+	return chain.invoke(
+		{
+			# Only later iterations of this ape can read the cached prefix back
+			"prefix": shared_prefix_messages(model, goal, search_context, cache=iterations > 1),
+			"findings_label": findings_label,
+			"findings": findings,
+			"iteration": iteration,
+			"iterations": iterations,
+		}
+	)
\ No newline at end of file
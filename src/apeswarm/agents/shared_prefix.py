@@ -0,0 +1,21 @@
+from langchain_core.messages import BaseMessage
+
+from apeswarm.core.model_factory import cacheable_system_message
+
+SWARM_PREAMBLE = """You are one ape in ApeSwarm, a sarcastic multi-agent swarm that ships real software.
+Every ape receives the same goal and repository context below.
+Your own role and output format follow in the next instructions."""
+
+
+def shared_prefix_messages(model, goal: str, search_context: str, cache: bool = True) -> list[BaseMessage]:
+	"""Build the prompt prefix every ape sends first.
+
+	The text depends only on the goal and repo context. What a provider
+	can reuse is the whole request prefix, though: structured apes call
+	tools on Anthropic, and tool schemas precede the system prompt there,
+	so they only share a cached prefix with later calls of the same ape.
+	Pass ``cache=False`` for calls nothing will read back (a single GitApe
+	plan, a candidate pick) to skip Anthropic's cache-write surcharge.
+	"""
+	text = f"{SWARM_PREAMBLE}\n\nGoal:\n{goal}\n\nRepository Search Context:\n{search_context}"
+	return [cacheable_system_message(model, text, cache=cache)]
\ No newline at end of file
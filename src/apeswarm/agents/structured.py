@@ -0,0 +1,48 @@
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel
+
+# Extra round trips allowed to fix output that fails schema validation
+DEFAULT_MAX_REPAIRS = 2
+
+
+class StructuredChain:
+	"""``prompt`` bound to ``model.with_structured_output(schema)``, built once and invoked many times.
+
+	On a validation failure the previous reply and the validation error are
+	sent back in the same conversation (same cached prefix), so only this
+	call is retried rather than the whole pipeline. ``invoke`` raises
+	ValueError once the repair budget is spent.
+	"""
+
+	def __init__(self, prompt, model, schema: type[BaseModel], max_repairs: int = DEFAULT_MAX_REPAIRS):
+		self.prompt = prompt
+		self.schema = schema
+		self.max_repairs = max_repairs
+		self.structured_model = model.with_structured_output(schema, include_raw=True)
+
+	def invoke(self, inputs: dict):
+		messages = self.prompt.invoke(inputs).to_messages()
+		error = None
+		for _ in range(self.max_repairs + 1):
+			result = self.structured_model.invoke(messages)
+			if result["parsed"] is not None and result["parsing_error"] is None:
+				return result["parsed"]
+			error = result["parsing_error"] or "no structured output was returned"
+			raw = result["raw"]
+			tool_calls = getattr(raw, "tool_calls", None)
+			previous = json.dumps([call["args"] for call in tool_calls]) if tool_calls else str(raw.content)
+			messages = [
+				*messages,
+				AIMessage(content=previous),
+				HumanMessage(
+					content=(
+						f"That output failed validation:\n{error}\n"
+						"Return a corrected response that satisfies the schema."
+					)
+				),
+			]
+		raise ValueError(
+			f"{self.schema.__name__} output still invalid after {self.max_repairs} repair attempt(s): {error}"
+		)
\ No newline at end of file
@@ -1,32 +1,115 @@
+import re
+
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from pydantic import BaseModel, Field
+
+from .shared_prefix import shared_prefix_messages
+from .structured import StructuredChain
+
+
+class CandidateScore(BaseModel):
+	index: int = Field(description="Zero-based candidate index")
+	score: int = Field(ge=0, le=10, description="0 = nonsense, 10 = grounded and shippable")
+	reason: str = Field(description="One sentence justification")
 
 
-def truth_ape_response(model, goal: str, builder_output: str, search_context: str) -> str:
-	prompt = ChatPromptTemplate.from_messages(
-		[
-			(
-				"system",
-				"""You are TruthApe in ApeSwarm.
+class CandidateVerdict(BaseModel):
+	scores: list[CandidateScore]
+	best_index: int = Field(description="Zero-based index of the candidate to forward")
+
+
+TRUTH_PROMPT = ChatPromptTemplate.from_messages(
+	[
+		MessagesPlaceholder("prefix"),
+		(
+			"system",
+			"""You are TruthApe in ApeSwarm.
 Your job is to verify claims and reduce nonsense.
 Be blunt but precise.
 Return concise markdown sections exactly:
 1) Verified
 2) Needs Evidence
 3) Risks
-4) Handoff to SelfEditApe""",
-			),
-			(
-				"human",
-				"Goal:\n{goal}\n\nBuilderApe Output:\n{builder_output}\n\nRepository Search Context:\n{search_context}",
-			),
-		]
-	)
-	chain = prompt | model | StrOutputParser()
+4) Handoff to SelfEditApe (write just "None" when nothing in the repository needs to change)""",
+		),
+		(
+			"human",
+			"BuilderApe Output:\n{builder_output}",
+		),
+	]
+)
+
+PICK_CANDIDATE_PROMPT = ChatPromptTemplate.from_messages(
+	[
+		MessagesPlaceholder("prefix"),
+		(
+			"system",
+			"""You are TruthApe in ApeSwarm.
+Several BuilderApe candidate plans answer the same goal.
+Score each one for how well it is grounded in the repository context,
+how practical it is, and how little it hallucinates.
+Pick the single best candidate.""",
+		),
+		(
+			"human",
+			"{candidates}",
+		),
+	]
+)
+
+
+_HANDOFF_HEADING = re.compile(r"^\W*(?:\d+\W*)?handoff to selfeditape\b", re.IGNORECASE | re.MULTILINE)
+_NO_HANDOFF = re.compile(r"^(?:none|nothing|n/a)\b", re.IGNORECASE)
+
+
+def truth_ape_has_handoff(truth_output: str) -> bool:
+	"""Whether TruthApe handed SelfEditApe anything to do.
+	
+	False only when the last section, "Handoff to SelfEditApe", is empty or
+	a short "None"; a missing section or anything longer counts as work.
+	"""
+	match = _HANDOFF_HEADING.search(truth_output)
+	if match is None:
+		return True
+	handoff = " ".join(re.sub(r"[*_`#>\-:]", " ", truth_output[match.end():]).split())
+	return bool(handoff) and not (_NO_HANDOFF.match(handoff) and len(handoff) <= 80)
+
+
+def truth_ape_chain(model):
+	return TRUTH_PROMPT | model | StrOutputParser()
+
+
+def truth_ape_pick_chain(model) -> StructuredChain:
+	return StructuredChain(PICK_CANDIDATE_PROMPT, model, CandidateVerdict)
+
+
+def truth_ape_response(model, goal: str, builder_output: str, search_context: str, chain=None) -> str:
+	chain = chain or truth_ape_chain(model)
 	return chain.invoke(
 		{
-			"goal": goal,
+			"prefix": shared_prefix_messages(model, goal, search_context),
 			"builder_output": builder_output,
-			"search_context": search_context,
+		}
+	)
+
+
+def truth_ape_pick_candidate(
+	model,
+	goal: str,
+	candidates: list[str],
+	search_context: str,
+	chain: StructuredChain | None = None,
+) -> CandidateVerdict:
+	"""Score every BuilderApe candidate against the repo context in one call."""
+	chain = chain or truth_ape_pick_chain(model)
+	formatted = "\n\n".join(
+		f"### Candidate {index}\n{candidate}" for index, candidate in enumerate(candidates)
+	)
+	return chain.invoke(
+		{
+			# Scored once per run, with its own tool schema: nothing reads a cache entry back
+			"prefix": shared_prefix_messages(model, goal, search_context, cache=False),
+			"candidates": formatted,
 		}
 	)
\ No newline at end of file
@@ -5,11 +5,14 @@ from dotenv import load_dotenv
 from rich.console import Console
 from rich.markdown import Markdown
 
-from .core.orchestrator import execute_swarm
+from .core.orchestrator import event_style, execute_swarm
 
 load_dotenv()
 console = Console()
 
+# Diff previews longer than this are shown in a pager instead of dumped inline
+_PAGED_DIFF_LINES = 120
+
 
 def _parse_args(argv: list[str]) -> argparse.Namespace:
 	parser = argparse.ArgumentParser(prog="apeswarm", description="Run the ApeSwarm multi-agent CLI")
@@ -39,7 +42,23 @@ def _parse_args(argv: list[str]) -> argparse.Namespace:
 		"--self-edit-iterations",
 		type=int,
 		default=1,
-		help="Requested self-edit loop iterations",
+		help="Maximum self-edit loop iterations (stops early once an iteration changes nothing)",
+	)
+	parser.add_argument(
+		"--llm-patch",
+		action="store_true",
+		help="Generate self-edit file edits with batched LLM requests instead of built-in heuristics",
+	)
+	parser.add_argument(
+		"--candidates",
+		type=int,
+		default=1,
+		help="Generate N BuilderApe plans concurrently and let TruthApe forward the best one",
+	)
+	parser.add_argument(
+		"--pipeline",
+		default=None,
+		help="Pipeline TOML file ordering the apes into stages (default: APESWARM_PIPELINE or the bundled pipeline)",
 	)
 	return parser.parse_args(argv)
 
@@ -60,6 +79,9 @@ def main() -> None:
 		+ f"git_write={args.allow_git_write} | "
 		+ f"auto_confirm={args.auto_confirm} | "
 		+ f"self_edit={args.self_edit} ({args.self_edit_iterations}) | "
+		+ f"llm_patch={args.llm_patch} | "
+		+ f"candidates={args.candidates} | "
+		+ f"pipeline={args.pipeline or 'default'} | "
 		+ f"confirm_self_edit_write={args.confirm_self_edit_write}"
 		+ "[/dim]\n"
 	)
@@ -74,6 +96,9 @@ def main() -> None:
 				confirm_self_edit_write=args.confirm_self_edit_write,
 				enable_self_edit=args.self_edit,
 				self_edit_iterations=args.self_edit_iterations,
+				self_edit_llm_patch=args.llm_patch,
+				builder_candidates=args.candidates,
+				pipeline=args.pipeline,
 			)
 	except ValueError as error:
 		console.print(f"[bold red]Config error:[/] {error}")
@@ -87,25 +112,14 @@ def main() -> None:
 		raise SystemExit(3) from error
 
 	for event in events:
-		if event["agent"] == "SarcasticApe":
-			style = "bold magenta"
-		elif event["agent"] == "BuilderApe":
-			style = "bold cyan"
-		elif event["agent"] == "TruthApe":
-			style = "bold bright_blue"
-		elif event["agent"] == "SelfEditApe":
-			style = "bold bright_white"
-		elif event["agent"] == "PatchesApplied":
-			style = "bold bright_green"
-		elif event["agent"] == "DiffPreview":
-			style = "bold yellow"
-		elif event["agent"] == "Guardrail":
-			style = "bold red"
-		elif event["agent"] == "GitExec":
-			style = "bold bright_green"
-		else:
-			style = "bold green"
+		style = event_style(event["agent"])
 		console.print(f"\n[{style}]{event['agent']}:[/]")
+		line_count = event["content"].count("\n")
+		if event["agent"] == "DiffPreview" and console.is_terminal and line_count > _PAGED_DIFF_LINES:
+			console.print(f"[dim]Diff preview is {line_count} lines, opening pager...[/dim]")
+			with console.pager(styles=True):
+				console.print(Markdown(event["content"]))
+			continue
 		console.print(Markdown(event["content"]))
 
 	console.print("\n[bold white on dark_green]Swarm complete.[/]")
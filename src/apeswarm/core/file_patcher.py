@@ -1,7 +1,20 @@
 """File modification logic for self-edit loop."""
+import ast
+import difflib
+import io
+import multiprocessing
+import os
 import re
+import shutil
+import tempfile
+import time
+import tokenize
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional, TypedDict
+
+from apeswarm.agents import PatchBatch, patch_ape_response
+from apeswarm.core.search import iter_repo_files
 
 
 def _extract_patch_targets(self_edit_output: str) -> list[tuple[str, str]]:
@@ -21,7 +34,7 @@ def _extract_patch_targets(self_edit_output: str) -> list[tuple[str, str]]:
 		# Match both bullet points and numbered items
 		if line.startswith('-') or line.startswith('•') or (len(line) > 0 and line[0].isdigit() and '.' in line[:3]):
 			# Remove bullet/number and strip
-			content = re.sub(r'^[-•\d]+[\.\)]\s*', '', line).strip()
+			content = re.sub(r'^(?:[-•*]|\d+[.)])\s*', '', line).strip()
 			# Try to extract filename: action pattern
 			match = re.match(r'([a-zA-Z0-9_./-]+\.(py|md|toml|yml|yaml|txt|sh)):\s*(.+)', content)
 			if match:
@@ -31,134 +44,629 @@ def _extract_patch_targets(self_edit_output: str) -> list[tuple[str, str]]:
 	return targets
 
 
-def _apply_simple_patch(file_path: Path, action_desc: str, model) -> bool:
-	"""Apply a simple patch to a file based on action description.
+# Action keywords -> Python transform; the first matching entry wins per action
+_PYTHON_TRANSFORM_KEYWORDS = (
+	(("type hint", "annotation"), "type_hints"),
+	(("docstring", "documentation"), "docstrings"),
+)
+_PLACEHOLDER_DOCSTRING = '"""TODO: Add description."""'
+
+# An edit is (0-based line index, column, text to insert)
+_Edit = tuple[int, int, str]
+
+
+def _select_python_transform(action_desc: str) -> Optional[str]:
+	"""Map an action description to a transform name.
 	
-	Uses LLM to generate safe, minimal modifications.
-	Returns True if patch was applied successfully.
+	"import" is recognised but has no transform (already handled elsewhere).
 	"""
-	if not file_path.exists():
-		return False
-	
-	content = file_path.read_text(encoding='utf-8', errors='replace')
-	
-	# For now, we'll use a simple heuristic approach for common patterns
-	# In production, this would use the LLM with proper safety checks
-	
-	if file_path.suffix == '.py':
-		# Python-specific patches
-		if 'type hint' in action_desc.lower() or 'annotation' in action_desc.lower():
-			# Simple: add basic type hints to function definitions without them
-			updated = _add_type_hints_to_functions(content)
-			if updated != content:
-				file_path.write_text(updated, encoding='utf-8')
-				return True
-		elif 'docstring' in action_desc.lower() or 'documentation' in action_desc.lower():
-			# Add docstrings to functions without them
-			updated = _add_docstrings_to_functions(content)
-			if updated != content:
-				file_path.write_text(updated, encoding='utf-8')
-				return True
-		elif 'import' in action_desc.lower():
-			# Remove unused imports (already have this elsewhere)
+	action_lower = action_desc.lower()
+	for keywords, transform_name in _PYTHON_TRANSFORM_KEYWORDS:
+		if any(keyword in action_lower for keyword in keywords):
+			return transform_name
+	if 'import' in action_lower:
+		return "import"
+	return None
+
+
+def _iter_functions(tree: ast.AST):
+	for node in ast.walk(tree):
+		if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+			yield node
+
+
+def _returns_value(func: ast.AST) -> bool:
+	"""Check whether a function returns or yields a value, ignoring nested scopes."""
+	pending = list(ast.iter_child_nodes(func))
+	while pending:
+		node = pending.pop()
+		if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+			continue
+		if isinstance(node, (ast.Yield, ast.YieldFrom)):
+			return True
+		if isinstance(node, ast.Return) and node.value is not None:
 			return True
+		pending.extend(ast.iter_child_nodes(node))
+	return False
+
+
+def _signature_close_paren(
+	tokens: list[tokenize.TokenInfo],
+	def_index: int,
+) -> Optional[tokenize.TokenInfo]:
+	"""Return the ``)`` closing the parameter list of the ``def`` at ``def_index``.
 	
-	elif file_path.suffix in ['.md', '.txt']:
-		# Markdown/text patches - typically additive
-		if 'add' in action_desc.lower() or 'update' in action_desc.lower():
-			# These are safe to skip for demo - user would review
-			pass
+	Works across multi-line signatures and skips PEP 695 type parameters.
+	"""
+	depth = 0
+	for token in tokens[def_index:]:
+		if token.type != tokenize.OP:
+			continue
+		if token.string in '([{':
+			depth += 1
+		elif token.string in ')]}':
+			depth -= 1
+			if depth == 0 and token.string == ')':
+				return token
+		elif token.string == ':' and depth == 0:
+			return None
+	return None
+
+
+def _type_hint_edits(
+	tree: ast.AST,
+	lines: list[str],
+	tokens: list[tokenize.TokenInfo],
+) -> list[_Edit]:
+	"""Add ``-> None`` to unannotated functions that never return a value."""
+	def_indexes = {
+		token.start[0]: index
+		for index, token in enumerate(tokens)
+		if token.type == tokenize.NAME and token.string == 'def'
+	}
+	edits = []
+	for func in _iter_functions(tree):
+		if func.returns is not None or _returns_value(func):
+			continue
+		def_index = def_indexes.get(func.lineno)
+		if def_index is None:
+			continue
+		close_paren = _signature_close_paren(tokens, def_index)
+		if close_paren is None:
+			continue
+		row, col = close_paren.end
+		edits.append((row - 1, col, ' -> None'))
+	return edits
+
+
+def _docstring_edits(
+	tree: ast.AST,
+	lines: list[str],
+	tokens: list[tokenize.TokenInfo],
+) -> list[_Edit]:
+	"""Add a placeholder docstring to functions that lack one."""
+	edits = []
+	for func in _iter_functions(tree):
+		if ast.get_docstring(func, clean=False) is not None:
+			continue
+		first = func.body[0]
+		# A decorated def/class reports its ``def`` line; the statement starts at its first decorator
+		decorators = getattr(first, 'decorator_list', None)
+		start_line = min(decorator.lineno for decorator in decorators) if decorators else first.lineno
+		body_line = lines[start_line - 1]
+		# Bodies sharing a line with the signature (``def f(): pass``) are left alone
+		if body_line.encode('utf-8')[: first.col_offset].strip():
+			continue
+		indent = body_line[: len(body_line) - len(body_line.lstrip())]
+		newline = '\r\n' if body_line.endswith('\r\n') else '\n'
+		edits.append((start_line - 1, 0, f'{indent}{_PLACEHOLDER_DOCSTRING}{newline}'))
+	return edits
+
+
+_PYTHON_TRANSFORMS = {
+	"type_hints": _type_hint_edits,
+	"docstrings": _docstring_edits,
+}
+
+
+def _transform_python_source(content: str, transform_names) -> str:
+	"""Apply several transforms to Python source with a single parse.
 	
-	return False
+	Every transform reads the same AST and token stream and only emits
+	insertions, so untouched code keeps its exact formatting. Sources that
+	fail to parse are returned unchanged; a result that no longer parses
+	raises ValueError so the caller never writes it.
+	"""
+	try:
+		tree = ast.parse(content)
+		tokens = list(tokenize.generate_tokens(io.StringIO(content).readline))
+	except (SyntaxError, tokenize.TokenError):
+		return content
+	
+	lines = io.StringIO(content).readlines()
+	edits: list[_Edit] = []
+	for name in dict.fromkeys(transform_names):
+		edits.extend(_PYTHON_TRANSFORMS[name](tree, lines, tokens))
+	
+	# Apply bottom-up so earlier positions stay valid
+	for line_index, col, text in sorted(edits, reverse=True):
+		line = lines[line_index]
+		lines[line_index] = line[:col] + text + line[col:]
+	updated = ''.join(lines)
+	try:
+		ast.parse(updated)
+	except SyntaxError as error:
+		raise ValueError(f"transform {', '.join(transform_names)} produced invalid Python: {error}") from error
+	return updated
 
 
 def _add_type_hints_to_functions(content: str) -> str:
 	"""Add basic type hints to function definitions."""
-	# Find function definitions without return type hints
-	pattern = r'(def\s+\w+\s*\([^)]*\))(\s*:)'
-	
-	def replacer(match) -> None:
-		sig = match.group(1)
-		colon = match.group(2)
-		# Only add if missing -> annotation
-		if '->' not in sig:
-			return sig + ' -> None' + colon
-		return match.group(0)
-	
-	return re.sub(pattern, replacer, content)
+	return _transform_python_source(content, ("type_hints",))
 
 
 def _add_docstrings_to_functions(content: str) -> str:
 	"""Add minimal docstrings to functions that lack them."""
-	lines = content.split('\n')
-	result = []
-	i = 0
+	return _transform_python_source(content, ("docstrings",))
+
+
+# Starting a worker (a fresh interpreter importing apeswarm) takes seconds while
+# the transforms run at roughly 0.4 MB/s, so smaller batches stay in-process
+_PROCESS_POOL_MIN_CHARS = 4_000_000
+# Target files larger than this are skipped rather than read into memory
+_MAX_SOURCE_BYTES = 1_000_000
+# Files larger than this are not sent to the LLM patch request
+_LLM_PATCH_MAX_FILE_CHARS = 60_000
+# Source sent in one LLM patch request; larger target sets are split over several
+_LLM_PATCH_MAX_BATCH_CHARS = 120_000
+_LLM_PATCH_SUFFIXES = {'.py', '.md', '.toml', '.yml', '.yaml', '.txt', '.sh'}
+
+
+class PatchTiming(TypedDict):
+	file: str
+	actions: int
+	transform_ms: float
+	write_ms: float
+
+
+class DiffStat(TypedDict):
+	file: str
+	added: int
+	removed: int
+
+
+class SkippedTarget(TypedDict):
+	file: str
+	reason: str
+
+
+class PatchRunResult(TypedDict):
+	applied_count: int
+	modified_files: list[str]
+	timings: list[PatchTiming]
+	rolled_back: bool
+	error: str
+	llm_ms: float
+	dry_run: bool
+	diff: str
+	diff_stats: list[DiffStat]
+	overlay: dict[str, str]
+	# Content before this run of every file written; empty in dry-run mode
+	originals: dict[str, str]
+	skipped: list[SkippedTarget]
+
+
+# (file_path, target name, action count, original, updated, transform_ms, applied if changed, no-op count)
+_FilePlan = tuple[Path, str, int, str, str, float, int, int]
+
+
+def _plan_file_patch(file_path: Path, action_descs: list[str]) -> tuple[list[str], int]:
+	"""Split the actions for one file into transform names and a no-op count.
 	
-	while i < len(lines):
-		line = lines[i]
-		result.append(line)
-		
-		# Check if this is a function def
-		if re.match(r'\s*def\s+\w+\(', line):
-			# Check next non-empty line
-			j = i + 1
-			indent_match = re.match(r'^(\s*)', line)
-			indent = indent_match.group(1) if indent_match else ''
-			
-			while j < len(lines) and not lines[j].strip():
-				result.append(lines[j])
-				j += 1
-			
-			if j < len(lines):
-				next_line = lines[j]
-				# Check if next line is already a docstring
-				if '"""' not in next_line and "'''" not in next_line:
-					# Add minimal docstring
-					docstring_indent = indent + '    '
-					result.append(f'{docstring_indent}"""TODO: Add description."""')
+	Only Python files are transformed; markdown/text patches are typically
+	additive and left for user review.
+	"""
+	if file_path.suffix != '.py':
+		return [], 0
+	selected = [_select_python_transform(action) for action in action_descs]
+	transform_names = [name for name in selected if name in _PYTHON_TRANSFORMS]
+	# Import cleanup is already handled elsewhere, count it as applied
+	return transform_names, selected.count("import")
+
+
+def _compute_file_patch(content: str, transform_names: list[str]) -> tuple[str, float]:
+	"""Transform one file's source, returning (updated, elapsed_ms). Runs in worker processes."""
+	started = time.perf_counter()
+	updated = _transform_python_source(content, transform_names)
+	return updated, (time.perf_counter() - started) * 1000
+
+
+def _compute_file_patches(jobs: list[tuple[str, list[str]]]) -> list[tuple[str, float]]:
+	"""Run transforms for every (content, transform_names) job, in a process pool when worthwhile."""
+	max_workers = min(len(jobs), os.cpu_count() or 1)
+	if max_workers < 2 or sum(len(content) for content, _ in jobs) < _PROCESS_POOL_MIN_CHARS:
+		return [_compute_file_patch(content, names) for content, names in jobs]
+	contents, names = zip(*jobs)
+	# Never fork: LangGraph runs this node on a worker thread of a threaded process
+	context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+	with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+		return list(executor.map(_compute_file_patch, contents, names))
+
+
+def _heuristic_patch_plans(
+	grouped: dict[Path, tuple[str, list[str]]],
+	read_source: Callable[[Path], str],
+) -> list[_FilePlan]:
+	"""Plan files with the built-in keyword-matched transforms."""
+	pending = []
+	jobs = []
+	for file_path, (filename, actions) in grouped.items():
+		transform_names, noop_count = _plan_file_patch(file_path, actions)
+		original = read_source(file_path) if transform_names else ""
+		pending.append((file_path, filename, actions, transform_names, noop_count, original))
+		if transform_names:
+			jobs.append((original, transform_names))
+	
+	outputs = iter(_compute_file_patches(jobs))
+	plans = []
+	for file_path, filename, actions, transform_names, noop_count, original in pending:
+		updated, transform_ms = next(outputs) if transform_names else (original, 0.0)
+		plans.append(
+			(file_path, filename, len(actions), original, updated, transform_ms, len(transform_names), noop_count)
+		)
+	return plans
+
+
+def _check_python(rel_path: str, content: str) -> None:
+	"""Raise ValueError unless ``content`` parses as Python."""
+	try:
+		ast.parse(content, filename=rel_path)
+	except SyntaxError as error:
+		raise ValueError(f"patched {rel_path} is not valid Python: {error}") from error
+
+
+def _apply_search_replace(content: str, edits) -> str:
+	"""Apply search/replace edits in order; each search must match exactly once."""
+	for edit in edits:
+		occurrences = content.count(edit.search) if edit.search else 0
+		if occurrences != 1:
+			raise ValueError(f"search block matched {occurrences} times: {edit.search[:60]!r}")
+		content = content.replace(edit.search, edit.replace, 1)
+	return content
+
+
+def _llm_patch_plans(
+	grouped: dict[Path, tuple[str, list[str]]],
+	repo_root: Path,
+	model,
+	read_source: Callable[[Path], str],
+	patch_chain=None,
+) -> tuple[list[_FilePlan], float, list[SkippedTarget]]:
+	"""Plan files with batched structured-output LLM requests.
+	
+	Targets are packed into as few requests as ``_LLM_PATCH_MAX_BATCH_CHARS``
+	allows. Returned edits are applied in memory and Python results must
+	parse before anything is planned for writing; any bad edit raises so
+	the whole run is rejected. Targets that are never sent, or that the
+	model returns no edits for, come back as skipped.
+	"""
+	skipped: list[SkippedTarget] = []
+	batches: list[dict[str, tuple[Path, str, list[str], str]]] = []
+	batch_chars = 0
+	for file_path, (filename, actions) in grouped.items():
+		key = file_path.relative_to(repo_root).as_posix()
+		if file_path.suffix not in _LLM_PATCH_SUFFIXES:
+			skipped.append({"file": key, "reason": f"unsupported file type {file_path.suffix or '(none)'}"})
+			continue
+		original = read_source(file_path)
+		if len(original) > _LLM_PATCH_MAX_FILE_CHARS:
+			skipped.append({"file": key, "reason": f"{len(original)} characters exceeds {_LLM_PATCH_MAX_FILE_CHARS}"})
+			continue
+		if not batches or batch_chars + len(original) > _LLM_PATCH_MAX_BATCH_CHARS:
+			batches.append({})
+			batch_chars = 0
+		batches[-1][key] = (file_path, filename, actions, original)
+		batch_chars += len(original)
+	
+	plans = []
+	llm_ms = 0.0
+	for by_key in batches:
+		started = time.perf_counter()
+		batch: PatchBatch = patch_ape_response(
+			model=model,
+			targets=[(key, actions, original) for key, (_, _, actions, original) in by_key.items()],
+			chain=patch_chain,
+		)
+		llm_ms += (time.perf_counter() - started) * 1000
 		
-		i += 1
+		for file_patch in batch.files:
+			key = file_patch.path.strip().removeprefix('./')
+			if key not in by_key:
+				raise ValueError(f"LLM patch targets unrequested file: {file_patch.path}")
+			file_path, filename, actions, original = by_key.pop(key)
+			started = time.perf_counter()
+			updated = _apply_search_replace(original, file_patch.edits)
+			if file_path.suffix == '.py':
+				_check_python(key, updated)
+			transform_ms = (time.perf_counter() - started) * 1000
+			plans.append((file_path, filename, len(actions), original, updated, transform_ms, len(actions), 0))
+		skipped.extend({"file": key, "reason": "model returned no edits"} for key in by_key)
+	return plans, llm_ms, skipped
+
+
+def _unified_diff(rel_path: str, original: str, updated: str) -> tuple[str, int, int]:
+	"""Render a git-style unified diff, returning (text, added, removed)."""
+	hunks = []
+	added = removed = 0
+	for line in difflib.unified_diff(
+		original.splitlines(keepends=True),
+		updated.splitlines(keepends=True),
+		fromfile=f"a/{rel_path}",
+		tofile=f"b/{rel_path}",
+	):
+		if line.startswith('+') and not line.startswith('+++'):
+			added += 1
+		elif line.startswith('-') and not line.startswith('---'):
+			removed += 1
+		if not line.endswith('\n'):
+			line += '\n\\ No newline at end of file\n'
+		hunks.append(line)
+	return f"diff --git a/{rel_path} b/{rel_path}\n" + ''.join(hunks), added, removed
+
+
+def cumulative_diff(
+	repo_root: Path,
+	paths: list[str],
+	overlay: dict[str, str],
+	originals: dict[str, str],
+) -> tuple[str, list[DiffStat]]:
+	"""Diff what each file held before any patch run against its latest content.
+	
+	Args:
+		repo_root: Root directory of the repository
+		paths: Repo-relative paths changed by any of the runs
+		overlay: Latest dry-run content by path; the file on disk otherwise
+		originals: Content before the first write by path; the file on disk otherwise
+	
+	Returns:
+		The unified diff and per-file stats, leaving out files that ended up
+		unchanged or can no longer be read
+	"""
+	diffs = []
+	stats: list[DiffStat] = []
+	for rel_path in paths:
+		try:
+			original = originals[rel_path] if rel_path in originals else _read_source(repo_root / rel_path)
+			updated = overlay[rel_path] if rel_path in overlay else _read_source(repo_root / rel_path)
+		except (OSError, ValueError):
+			continue
+		if updated == original:
+			continue
+		diff_text, added, removed = _unified_diff(rel_path, original, updated)
+		diffs.append(diff_text)
+		stats.append({"file": rel_path, "added": added, "removed": removed})
+	return ''.join(diffs), stats
+
+
+def _read_source(file_path: Path) -> str:
+	# newline='' keeps CRLF files byte-identical outside the inserted lines
+	with file_path.open(encoding='utf-8', errors='replace', newline='') as handle:
+		# A character is at least one byte, so files under the byte cap are read whole
+		content = handle.read(_MAX_SOURCE_BYTES + 1)
+	if len(content) > _MAX_SOURCE_BYTES:
+		raise ValueError(f"{file_path.name} grew past {_MAX_SOURCE_BYTES} bytes while patching")
+	return content
+
+
+def _atomic_write_text(file_path: Path, content: str) -> None:
+	"""Write via a sibling temp file and ``os.replace`` so readers never see a partial file."""
+	fd, tmp_name = tempfile.mkstemp(prefix=f'.{file_path.name}.', suffix='.tmp', dir=file_path.parent)
+	try:
+		with os.fdopen(fd, 'w', encoding='utf-8', newline='') as handle:
+			handle.write(content)
+		shutil.copymode(file_path, tmp_name)
+		os.replace(tmp_name, file_path)
+	except BaseException:
+		Path(tmp_name).unlink(missing_ok=True)
+		raise
+
+
+def _rollback(written: list[tuple[Path, str]]) -> list[str]:
+	"""Restore original contents of already-written files, returning any that could not be restored."""
+	failed = []
+	for file_path, original in reversed(written):
+		try:
+			_atomic_write_text(file_path, original)
+		except OSError:
+			failed.append(str(file_path))
+	return failed
+
+
+def _build_path_index(repo_root: Path) -> dict[str, list[Path]]:
+	"""Map each file basename in the repository to every path carrying it.
+	
+	Built once per patch run so unresolved targets cost a dict lookup
+	instead of a full tree walk each.
+	"""
+	index: dict[str, list[Path]] = {}
+	for file_path in iter_repo_files(repo_root):
+		index.setdefault(file_path.name, []).append(file_path)
+	return index
+
+
+def _resolve_target_path(
+	filename: str,
+	repo_root: Path,
+	path_index: dict[str, list[Path]],
+) -> Optional[Path]:
+	"""Pick the indexed path that best matches a (possibly partial) target name.
+	
+	Candidates sharing the longest trailing run of path components with the
+	target win; ties go to the shallowest path, then alphabetical order, so
+	the same target always resolves to the same file.
+	"""
+	target_parts = Path(filename).parts
+	candidates = path_index.get(target_parts[-1] if target_parts else filename, [])
+	if not candidates:
+		return None
+	
+	def rank(candidate: Path) -> tuple[int, int, str]:
+		rel_parts = candidate.relative_to(repo_root).parts
+		shared = 0
+		for target_part, rel_part in zip(reversed(target_parts), reversed(rel_parts)):
+			if target_part != rel_part:
+				break
+			shared += 1
+		return (-shared, len(rel_parts), candidate.as_posix())
 	
-	return '\n'.join(result)
+	return min(candidates, key=rank)
 
 
 def apply_self_edit_patches(
 	self_edit_output: str,
 	repo_root: Path,
 	model=None,
-) -> tuple[int, list[str]]:
+	use_llm: bool = False,
+	dry_run: bool = False,
+	overlay: Optional[dict[str, str]] = None,
+	targets: Optional[list[tuple[str, str]]] = None,
+	patch_chain=None,
+	reserve: Optional[Callable[[str, str], bool]] = None,
+) -> PatchRunResult:
 	"""Apply self-edit patch recommendations to repository files.
 	
+	Patches are grouped per file, transformed (in a process pool for larger
+	runs) into an in-memory overlay, diffed against the originals and only
+	then written, each file atomically. If anything fails, every file
+	already written is restored and nothing counts as applied.
+	
 	Args:
-		self_edit_output: Markdown-formatted recommendations from SelfEditApe
+		self_edit_output: Markdown-formatted recommendations (used when ``targets`` is not given)
 		repo_root: Root directory of the repository
 		model: LLM model (optional, for advanced patching)
+		use_llm: Generate edits for all targets with batched LLM requests
+			instead of the built-in heuristics (requires ``model``)
+		dry_run: Build the overlay and diff without writing anything; counts
+			and files then describe what would be applied
+		overlay: Repo-relative path -> content to patch instead of the file on
+			disk, so successive dry runs can build on each other
+		targets: Already-structured (path, action) pairs; when given,
+			``self_edit_output`` is not parsed
+		patch_chain: Precompiled PatchApe chain for ``model`` (built per call otherwise)
+		reserve: Called with (path, content) before a changed file is kept in
+			the result, with the patched content in dry-run mode and the prior
+			content otherwise; a false return skips the file unwritten
 	
 	Returns:
-		(count_applied, list_of_modified_files)
+		PatchRunResult with applied count, modified files (repo-relative
+		paths), per-file timings, the unified diff of all changes, targets
+		that were skipped and why and, in dry-run mode, the patched content
+		of every changed file (the prior content of written files otherwise)
 	"""
-	targets = _extract_patch_targets(self_edit_output)
-	applied_count = 0
-	modified_files = []
+	if targets is None:
+		targets = _extract_patch_targets(self_edit_output)
+	result: PatchRunResult = {
+		"applied_count": 0,
+		"modified_files": [],
+		"timings": [],
+		"rolled_back": False,
+		"error": "",
+		"llm_ms": 0.0,
+		"dry_run": dry_run,
+		"diff": "",
+		"diff_stats": [],
+		"overlay": {},
+		"originals": {},
+		"skipped": [],
+	}
+	
+	def read_source(file_path: Path) -> str:
+		rel_path = file_path.relative_to(repo_root).as_posix()
+		if overlay and rel_path in overlay:
+			return overlay[rel_path]
+		return _read_source(file_path)
+	path_index: Optional[dict[str, list[Path]]] = None
+	# Resolved path -> (first target name seen, actions), so each file is patched once
+	grouped: dict[Path, tuple[str, list[str]]] = {}
 	
 	for filename, action in targets:
 		file_path = repo_root / filename
 		
 		# Resolve path if it doesn't exist directly
 		if not file_path.exists():
-			# Try to find it
-			candidates = list(repo_root.rglob(filename.split('/')[-1]))
-			if candidates:
-				file_path = candidates[0]
-			else:
+			# Index the tree lazily, at most once per run
+			if path_index is None:
+				path_index = _build_path_index(repo_root)
+			file_path = _resolve_target_path(filename, repo_root, path_index)
+			if file_path is None:
+				result["skipped"].append({"file": filename, "reason": "not found in the repository"})
 				continue
+		if file_path.stat().st_size > _MAX_SOURCE_BYTES:
+			result["skipped"].append({"file": filename, "reason": f"larger than {_MAX_SOURCE_BYTES} bytes"})
+			continue
 		
-		try:
-			if _apply_simple_patch(file_path, action, model):
-				applied_count += 1
-				modified_files.append(filename)
-		except Exception:
-			# Silently skip patches that fail
-			pass
-	
-	return applied_count, modified_files
+		grouped.setdefault(file_path, (filename, []))[1].append(action)
+	
+	written: list[tuple[Path, str]] = []
+	try:
+		if use_llm and model is not None:
+			plans, llm_ms, llm_skipped = _llm_patch_plans(grouped, repo_root, model, read_source, patch_chain)
+			result["llm_ms"] = round(llm_ms, 3)
+			result["skipped"].extend(llm_skipped)
+		else:
+			plans = _heuristic_patch_plans(grouped, read_source)
+		
+		# Validate every changed Python file before the first write, whichever path planned it
+		for file_path, _, _, original, updated, *_ in plans:
+			if file_path.suffix == '.py' and updated != original:
+				_check_python(file_path.relative_to(repo_root).as_posix(), updated)
+		
+		applied_count = 0
+		modified_files = []
+		diffs = []
+		for file_path, filename, action_count, original, updated, transform_ms, change_count, noop_count in plans:
+			file_applied = noop_count
+			write_ms = 0.0
+			rel_path = file_path.relative_to(repo_root).as_posix()
+			if updated != original:
+				if reserve is not None and not reserve(rel_path, updated if dry_run else original):
+					result["skipped"].append({"file": rel_path, "reason": "its content would exceed the state budget"})
+					continue
+				diff_text, added, removed = _unified_diff(rel_path, original, updated)
+				diffs.append(diff_text)
+				result["diff_stats"].append({"file": rel_path, "added": added, "removed": removed})
+				if dry_run:
+					result["overlay"][rel_path] = updated
+				else:
+					started = time.perf_counter()
+					_atomic_write_text(file_path, updated)
+					write_ms = (time.perf_counter() - started) * 1000
+					written.append((file_path, original))
+					result["originals"][rel_path] = original
+				file_applied += change_count
+			result["timings"].append(
+				{
+					"file": filename,
+					"actions": action_count,
+					"transform_ms": round(transform_ms, 3),
+					"write_ms": round(write_ms, 3),
+				}
+			)
+			if file_applied:
+				applied_count += file_applied
+				modified_files.append(rel_path)
+	except Exception as error:
+		unrestored = _rollback(written)
+		result["rolled_back"] = True
+		result["diff_stats"] = []
+		result["overlay"] = {}
+		result["originals"] = {}
+		result["error"] = f"{type(error).__name__}: {error}"
+		if unrestored:
+			result["error"] += f" (rollback failed for: {', '.join(unrestored)})"
+		return result
+	
+	result["applied_count"] = applied_count
+	result["modified_files"] = modified_files
+	result["diff"] = ''.join(diffs)
+	return result
@@ -1,33 +1,38 @@
 from pathlib import Path
-import re
+import time
 
 from git import GitCommandError, Repo
 
+from apeswarm.agents import GitPlan
 
-def _extract_field(markdown: str, field_name: str) -> str | None:
-	pattern = rf"{re.escape(field_name)}\s*[:\n]\s*(.+)"
-	match = re.search(pattern, markdown, flags=re.IGNORECASE)
-	if not match:
-		return None
-	return match.group(1).strip()
 
-
-def parse_git_plan(markdown: str) -> tuple[str, str]:
-	branch = _extract_field(markdown, "Branch Name") or "feat/git-ape-auto-plan"
-	commit = _extract_field(markdown, "Commit Message") or "chore: apply gitape planned updates"
-	branch = re.sub(r"[^a-zA-Z0-9._/-]", "-", branch).strip("-")
-	if not branch:
-		branch = "feat/git-ape-auto-plan"
-	return branch, commit
+def _parse_porcelain_z(output: str) -> list[tuple[str, str]]:
+	entries: list[tuple[str, str]] = []
+	fields = iter(output.split("\0"))
+	for field in fields:
+		if not field:
+			continue
+		code, path = field[:2], field[3:]
+		# Renames/copies carry the original path as an extra field
+		if code[0] in "RC":
+			next(fields, None)
+		entries.append((code, path))
+	return entries
 
 
 def execute_git_plan(
-	git_plan_markdown: str,
+	git_plan: GitPlan,
 	repo_root: Path,
 	allow_write: bool,
 	auto_confirm: bool,
+	paths: list[str] | None = None,
 ) -> str:
-	branch_name, commit_message = parse_git_plan(git_plan_markdown)
+	"""Create the planned branch and commit.
+	
+	With ``paths`` only those files are staged and committed (an empty list
+	means there is nothing to commit); ``None`` stages the whole tree.
+	"""
+	branch_name, commit_message = git_plan.branch_name, git_plan.commit_message
 	preamble = (
 		f"Branch Name: {branch_name}\n"
 		f"Commit Message: {commit_message}\n"
@@ -40,24 +45,40 @@ def execute_git_plan(
 	if not auto_confirm:
 		return preamble + "Action: Write requested but blocked because auto-confirm is disabled."
 
+	if paths is not None and not paths:
+		return preamble + "Action: No changes to commit."
+
 	repo = Repo(repo_root)
 	if repo.bare:
 		return preamble + "Action: Failed. Repository is bare."
 
+	timings: dict[str, float] = {}
+
+	def timed(name: str, *args, **kwargs):
+		started = time.perf_counter()
+		try:
+			return getattr(repo.git, name)(*args, **kwargs)
+		finally:
+			timings[name] = (time.perf_counter() - started) * 1000
+
+	pathspec = ["--", *paths] if paths is not None else []
 	try:
-		repo.git.checkout("-B", branch_name)
-		repo.git.add(A=True)
-		if not repo.is_dirty(untracked_files=True):
+		timed("checkout", "-B", branch_name)
+		timed("add", "-A", *pathspec)
+		# One scoped status call serves both dirty detection and the summary;
+		# everything relevant is staged by now, so skip the untracked-file walk
+		status = timed("status", "--porcelain", "-z", "--untracked-files=no", *pathspec)
+		staged = [path for code, path in _parse_porcelain_z(status) if code[0] not in " ?!"]
+		if not staged:
 			return preamble + "Action: No changes to commit."
 		
-		repo.index.commit(commit_message)
+		# Native commit limited to the same pathspec, so unrelated staged work stays out
+		timed("commit", "--quiet", "-m", commit_message, *pathspec)
+		timing_line = " | ".join(f"{name} {elapsed:.1f} ms" for name, elapsed in timings.items())
 		
 		# Build post-commit summary
 		try:
 			commit_hash = repo.head.commit.hexsha[:7]
-			changed_files = []
-			if repo.head.commit.parents:
-				changed_files = list(repo.index.diff(repo.head.commit.parents[0]))
 			
 			# Get remote URL safely
 			remote_url = ""
@@ -76,7 +97,8 @@ def execute_git_plan(
 				f"✅ Commit Created: {commit_hash}\n"
 				f"📦 Branch: {branch_name}\n"
 				f"📝 Message: {commit_message}\n"
-				f"📄 Files Changed: {len(changed_files)}\n"
+				f"📄 Files Changed: {len(staged)}\n"
+				f"⏱️  Git Timings: {timing_line}\n"
 				f"\n"
 				f"NEXT STEPS:\n"
 				f"  → Review changes: git show {commit_hash}\n"
@@ -0,0 +1,58 @@
+"""Token usage collection across every LLM call in a swarm run."""
+import threading
+from typing import TypedDict
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class UsageTotals(TypedDict):
+	llm_calls: int
+	input_tokens: int
+	output_tokens: int
+	cache_read_tokens: int
+	cache_creation_tokens: int
+
+
+class UsageMetrics(BaseCallbackHandler):
+	"""Sum ``usage_metadata`` from every chat model response, including cache hits.
+
+	Passed as a callback on the graph config; LangGraph propagates it to the
+	chains invoked inside each node, including parallel candidate branches.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.totals: UsageTotals = {
+			"llm_calls": 0,
+			"input_tokens": 0,
+			"output_tokens": 0,
+			"cache_read_tokens": 0,
+			"cache_creation_tokens": 0,
+		}
+
+	def on_llm_end(self, response, **kwargs) -> None:
+		for generations in response.generations:
+			for generation in generations:
+				usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+				details = usage.get("input_token_details") or {}
+				with self._lock:
+					self.totals["llm_calls"] += 1
+					self.totals["input_tokens"] += usage.get("input_tokens", 0)
+					self.totals["output_tokens"] += usage.get("output_tokens", 0)
+					self.totals["cache_read_tokens"] += details.get("cache_read", 0) or 0
+					self.totals["cache_creation_tokens"] += details.get("cache_creation", 0) or 0
+
+	def summary(self) -> str:
+		totals = self.totals
+		hit_rate = (
+			f"{totals['cache_read_tokens'] / totals['input_tokens']:.0%}"
+			if totals["input_tokens"]
+			else "n/a"
+		)
+		return (
+			f"LLM calls: {totals['llm_calls']} | "
+			f"input tokens: {totals['input_tokens']} "
+			f"(cache read: {totals['cache_read_tokens']}, cache write: {totals['cache_creation_tokens']}, "
+			f"hit rate: {hit_rate}) | "
+			f"output tokens: {totals['output_tokens']}"
+		)
@@ -1,9 +1,12 @@
 import os
+import time
 
 from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import SystemMessage
 from langchain_groq import ChatGroq
 from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
+from ollama import Client as OllamaClient
 
 
 def _require_env(name: str) -> str:
@@ -13,8 +16,50 @@ def _require_env(name: str) -> str:
 	return value
 
 
-def get_model(temperature: float | None = None):
-	provider = os.getenv("LLM_PROVIDER", "xai").strip().lower()
+def _env_int(name: str) -> int | None:
+	value = os.getenv(name, "").strip()
+	if not value:
+		return None
+	try:
+		return int(value)
+	except ValueError as error:
+		raise ValueError(f"{name} must be an integer, got {value!r}") from error
+
+
+def _ollama_keep_alive() -> int | str:
+	# Seconds ("-1" = forever, "0" = unload after each request) or a duration like "30m"
+	value = os.getenv("OLLAMA_KEEP_ALIVE", "30m").strip()
+	return int(value) if value.lstrip("-").isdigit() else value
+
+
+def _ollama_options(model: ChatOllama) -> dict:
+	return {
+		key: value
+		for key, value in {"num_ctx": model.num_ctx, "num_thread": model.num_thread}.items()
+		if value is not None
+	}
+
+
+def prompt_cache_enabled() -> bool:
+	return os.getenv("PROMPT_CACHE", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def cacheable_system_message(model, text: str, cache: bool = True) -> SystemMessage:
+	"""Wrap a stable prompt prefix so the provider can cache it.
+
+	Anthropic only caches up to an explicit ``cache_control`` breakpoint,
+	and writing one costs more than an uncached read, so ``cache`` should
+	be false when no later request will read it back. OpenAI and xAI cache
+	identical prefixes automatically, so a plain message is enough there
+	as long as the text is byte-identical between calls.
+	"""
+	if cache and prompt_cache_enabled() and isinstance(model, ChatAnthropic):
+		return SystemMessage(content=[{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}])
+	return SystemMessage(content=text)
+
+
+def get_model(temperature: float | None = None, provider: str | None = None):
+	provider = (provider or os.getenv("LLM_PROVIDER", "xai")).strip().lower()
 	chosen_temperature = (
 		temperature if temperature is not None else float(os.getenv("TEMPERATURE", "0.82"))
 	)
@@ -57,8 +102,43 @@ def get_model(temperature: float | None = None):
 			model=os.getenv("OLLAMA_MODEL", "llama3.1:8b"),
 			base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
 			temperature=chosen_temperature,
+			keep_alive=_ollama_keep_alive(),
+			num_ctx=_env_int("OLLAMA_NUM_CTX"),
+			num_thread=_env_int("OLLAMA_NUM_THREAD"),
 		)
 
 	raise ValueError(
 		"Unsupported LLM_PROVIDER. Use one of: xai, anthropic, openai, groq, ollama"
 	)
+
+
+def warm_up(model) -> float | None:
+	"""Load a local model into memory ahead of the first real request.
+
+	Ollama loads a model on an empty generate request. The request carries
+	the same keep-alive and context options as the chat calls, because a
+	different ``num_ctx`` would make the server reload the model. Returns
+	the seconds spent, or None when the model needs no warm-up.
+	"""
+	if not isinstance(model, ChatOllama):
+		return None
+	if os.getenv("OLLAMA_WARM_UP", "1").strip().lower() in {"0", "false", "no", "off"}:
+		return None
+	started = time.perf_counter()
+	OllamaClient(host=model.base_url, **(model.client_kwargs or {})).generate(
+		model=model.model,
+		keep_alive=model.keep_alive,
+		options=_ollama_options(model) or None,
+	)
+	return time.perf_counter() - started
+
+
+def request_concurrency() -> int | None:
+	"""Cap on LLM requests in flight for one run, None when unlimited.
+
+	A local Ollama server serves OLLAMA_NUM_PARALLEL requests per model and
+	queues the rest, so fanning out further only adds memory pressure.
+	"""
+	if os.getenv("LLM_PROVIDER", "xai").strip().lower() != "ollama":
+		return None
+	return _env_int("OLLAMA_MAX_CONCURRENCY")
\ No newline at end of file
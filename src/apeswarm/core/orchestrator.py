@@ -1,31 +1,58 @@
+import ast
+from contextlib import contextmanager
+import os
 from pathlib import Path
 import re
-from typing import TypedDict
+from typing import Annotated, TypedDict
 
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import END, START, StateGraph
 
 from apeswarm.agents import (
+	DEFAULT_GIT_PLAN,
+	builder_ape_candidates,
 	builder_ape_response,
 	git_ape_response,
 	sarcastic_ape_response,
 	self_edit_ape_response,
+	truth_ape_has_handoff,
+	truth_ape_pick_candidate,
 	truth_ape_response,
 )
-from apeswarm.core.file_patcher import apply_self_edit_patches
+from apeswarm.core.file_patcher import PatchRunResult, apply_self_edit_patches, cumulative_diff
 from apeswarm.core.git_executor import execute_git_plan
-from apeswarm.core.model_factory import get_model
-from apeswarm.core.search import collect_repo_context
+from apeswarm.core.metrics import UsageMetrics
+from apeswarm.core.model_factory import get_model, request_concurrency, warm_up
+from apeswarm.core.pipeline import (
+	AGENT_SPECS,
+	DEFAULT_TIER,
+	MAX_STATE_MAP_CHARS,
+	AgentContext,
+	compile_pipeline,
+	event_styles,
+	field_events,
+	load_pipeline,
+	register_agent,
+)
+from apeswarm.core.search import collect_file_context, collect_repo_context
+from apeswarm.core.worktree import get_worktree_pool
+
+
+def _latest(_previous: str, current: str) -> str:
+	return current
 
 
 class SwarmState(TypedDict):
 	goal: str
-	active_agent: str
+	# Agents in a parallel stage all report themselves active in the same step
+	active_agent: Annotated[str, _latest]
 	allow_git_write: bool
 	auto_confirm: bool
 	confirm_self_edit_write: bool
 	enable_self_edit: bool
 	self_edit_iterations: int
+	self_edit_llm_patch: bool
+	builder_candidates: int
+	builder_selection_note: str
 	sarcastic_output: str
 	builder_output: str
 	truth_output: str
@@ -33,9 +60,17 @@ class SwarmState(TypedDict):
 	self_edit_diff_preview: str
 	self_edit_guardrail_note: str
 	self_edit_applied_patches: list[str]
+	self_edit_changed_files: list[str]
+	self_edit_iteration: int
+	self_edit_feedback: str
+	# Dry-run content by path; with self_edit_originals at most MAX_STATE_MAP_CHARS in total
+	self_edit_overlay: dict[str, str]
+	# Content of each written file before its first self-edit write
+	self_edit_originals: dict[str, str]
 	git_output: str
 	git_exec_output: str
 	search_context: str
+	repo_root: str
 
 
 class SwarmEvent(TypedDict):
@@ -44,214 +79,489 @@ class SwarmEvent(TypedDict):
 
 
 _CHECKPOINTER = MemorySaver()
-_APP = None
-
-
-def _build_self_edit_diff_preview(self_edit_output: str) -> str:
-	lines = [line.strip() for line in self_edit_output.splitlines() if line.strip()]
-	targets = [line.lstrip("-•0123456789. ") for line in lines if line.startswith(("-", "•"))]
-	if not targets:
-		targets = lines[:3]
-
-	preview_chunks: list[str] = []
-	for target in targets[:3]:
-		match = re.search(r"([a-zA-Z0-9_./-]+\.(py|md|toml|yml|yaml|txt))", target)
-		file_name = match.group(1) if match else "TBD_FILE"
-		preview_chunks.append(
-			"\n".join(
-				[
-					f"--- a/{file_name}",
-					f"+++ b/{file_name}",
-					"@@", 
-					"- TODO: existing behavior", 
-					f"+ TODO: {target}",
-				]
-			)
-		)
+# Cap on diff lines fed back between self-edit iterations, keeps prompts flat
+_FEEDBACK_DIFF_LINES = 60
+# State keys execute_swarm fills from its arguments, readable by any stage
+_RUN_INPUTS = {
+	"goal",
+	"allow_git_write",
+	"auto_confirm",
+	"confirm_self_edit_write",
+	"enable_self_edit",
+	"self_edit_iterations",
+	"self_edit_llm_patch",
+	"builder_candidates",
+	"search_context",
+	"repo_root",
+}
+_APPS: dict[str, tuple[object, list[str]]] = {}
 
-	return "Proposed self-edit diff preview (simulation only):\n\n```diff\n" + "\n\n".join(preview_chunks) + "\n```"
-
-
-def _build_app():
-	model = get_model()
-
-	def sarcastic_ape_node(state: SwarmState) -> SwarmState:
-		return {
-			"goal": state["goal"],
-			"active_agent": "BuilderApe",
-			"allow_git_write": state["allow_git_write"],
-			"auto_confirm": state["auto_confirm"],
-			"confirm_self_edit_write": state["confirm_self_edit_write"],
-			"enable_self_edit": state["enable_self_edit"],
-			"self_edit_iterations": state["self_edit_iterations"],
-			"sarcastic_output": sarcastic_ape_response(model, state["goal"]),
-			"builder_output": state["builder_output"],
-			"truth_output": state["truth_output"],
-			"self_edit_output": state["self_edit_output"],
-			"self_edit_diff_preview": state["self_edit_diff_preview"],
-			"self_edit_guardrail_note": state["self_edit_guardrail_note"],			"self_edit_applied_patches": state["self_edit_applied_patches"],			"git_output": state["git_output"],
-			"git_exec_output": state["git_exec_output"],
-			"search_context": state["search_context"],
-		}
 
-	def builder_ape_node(state: SwarmState) -> SwarmState:
-		return {
-			"goal": state["goal"],
-			"active_agent": "TruthApe",
-			"allow_git_write": state["allow_git_write"],
-			"auto_confirm": state["auto_confirm"],
-			"confirm_self_edit_write": state["confirm_self_edit_write"],
-			"enable_self_edit": state["enable_self_edit"],
-			"self_edit_iterations": state["self_edit_iterations"],
-			"sarcastic_output": state["sarcastic_output"],
-			"builder_output": builder_ape_response(
-				model=model,
-				goal=state["goal"],
-				sarcastic_context=state["sarcastic_output"],
-			),
-			"truth_output": state["truth_output"],
-			"self_edit_output": state["self_edit_output"],
-			"self_edit_diff_preview": state["self_edit_diff_preview"],
-			"self_edit_guardrail_note": state["self_edit_guardrail_note"],
-			"self_edit_applied_patches": state["self_edit_applied_patches"],
-			"git_output": state["git_output"],
-			"git_exec_output": state["git_exec_output"],
-			"search_context": state["search_context"],
-		}
+def _build_self_edit_diff_preview(patch_result: PatchRunResult) -> str:
+	if patch_result["rolled_back"]:
+		return ""
+	stats = patch_result["diff_stats"]
+	skipped = "".join(f"\n- skipped {item['file']}: {item['reason']}" for item in patch_result["skipped"])
+	if not stats:
+		return "Self-edit diff preview: no file changes result from the proposed patch targets." + skipped
 
-	def truth_ape_node(state: SwarmState) -> SwarmState:
-		return {
-			"goal": state["goal"],
-			"active_agent": "SelfEditApe",
-			"allow_git_write": state["allow_git_write"],
-			"auto_confirm": state["auto_confirm"],
-			"confirm_self_edit_write": state["confirm_self_edit_write"],
-			"enable_self_edit": state["enable_self_edit"],
-			"self_edit_iterations": state["self_edit_iterations"],
-			"sarcastic_output": state["sarcastic_output"],
-			"builder_output": state["builder_output"],
-			"truth_output": truth_ape_response(
-				model=model,
-				goal=state["goal"],
-				builder_output=state["builder_output"],
-				search_context=state["search_context"],
-			),
-			"self_edit_output": state["self_edit_output"],
-			"self_edit_diff_preview": state["self_edit_diff_preview"],
-			"self_edit_guardrail_note": state["self_edit_guardrail_note"],
-			"self_edit_applied_patches": state["self_edit_applied_patches"],
-			"git_output": state["git_output"],
-			"git_exec_output": state["git_exec_output"],
-			"search_context": state["search_context"],
-		}
+	width = max(len(stat["file"]) for stat in stats)
+	stat_lines = [
+		f" {stat['file'].ljust(width)} | {stat['added'] + stat['removed']:>4} "
+		+ "+" * min(stat["added"], 40)
+		+ "-" * min(stat["removed"], 40)
+		for stat in stats
+	]
+	added = sum(stat["added"] for stat in stats)
+	removed = sum(stat["removed"] for stat in stats)
+	stat_lines.append(f" {len(stats)} file(s) changed, {added} insertion(s)(+), {removed} deletion(s)(-)")
+	mode = "dry-run, nothing written" if patch_result["dry_run"] else "written"
+	# Patched markdown may itself contain fences, so out-fence the longest backtick run
+	fence = "`" * max(3, max((len(run) for run in re.findall(r"`+", patch_result["diff"])), default=0) + 1)
+	return (
+		f"Self-edit diff preview ({mode}):\n\n```text\n"
+		+ "\n".join(stat_lines)
+		+ f"\n```\n\n{fence}diff\n"
+		+ patch_result["diff"]
+		+ fence
+		+ (f"\n{skipped}" if skipped else "")
+	)
 
-	def self_edit_ape_node(state: SwarmState) -> SwarmState:
-		guardrail_note = ""
-		applied_patches = []
-		
-		if not state["enable_self_edit"]:
-			self_edit_output = "Self-edit loop disabled for this run."
-			self_edit_diff_preview = ""
-		else:
-			self_edit_output = self_edit_ape_response(
-				model=model,
+
+def _candidate_specs(count: int) -> list[tuple[str | None, float]]:
+	"""Spread BuilderApe candidates over temperatures and, optionally, providers.
+	
+	CANDIDATE_PROVIDERS (comma-separated) is cycled across candidates; by
+	default every candidate uses LLM_PROVIDER.
+	"""
+	providers = [name.strip() for name in os.getenv("CANDIDATE_PROVIDERS", "").split(",") if name.strip()]
+	specs = []
+	for index in range(count):
+		temperature = round(0.2 + index * 0.8 / (count - 1), 2) if count > 1 else None
+		provider = providers[index % len(providers)] if providers else None
+		specs.append((provider, temperature))
+	return specs
+
+
+def _build_iteration_feedback(
+	goal: str,
+	repo_root: Path,
+	iteration: int,
+	patch_result: PatchRunResult,
+	overlay: dict[str, str],
+) -> str:
+	"""Summarise one iteration for the next: stats, a re-check of just the changed files, a capped diff.
+	
+	Empty when nothing changed, which ends the loop.
+	"""
+	stats = patch_result["diff_stats"]
+	if not stats:
+		return ""
+
+	changed: dict[str, str] = {}
+	checks: list[str] = []
+	for stat in stats:
+		rel = stat["file"]
+		content = overlay.get(rel)
+		if content is None:
+			content = (repo_root / rel).read_text(encoding="utf-8", errors="replace")
+		changed[rel] = content
+		if rel.endswith(".py"):
+			try:
+				ast.parse(content, filename=rel)
+				checks.append(f"- {rel}: parses OK")
+			except SyntaxError as error:
+				checks.append(f"- {rel}: SyntaxError line {error.lineno}: {error.msg}")
+
+	diff_lines = patch_result["diff"].splitlines()
+	diff_text = "\n".join(diff_lines[:_FEEDBACK_DIFF_LINES])
+	if len(diff_lines) > _FEEDBACK_DIFF_LINES:
+		diff_text += f"\n... ({len(diff_lines) - _FEEDBACK_DIFF_LINES} more diff lines omitted)"
+	return "\n".join(
+		[
+			f"Iteration {iteration} changed {len(stats)} file(s):",
+			*(f"- {stat['file']}: +{stat['added']} -{stat['removed']}" for stat in stats),
+			"",
+			"Targeted re-check of changed files:",
+			*checks,
+			collect_file_context(goal=goal, files=changed, max_hits=8),
+			"",
+			"Diff:",
+			diff_text,
+		]
+	)
+
+
+def _run_sarcastic(context: AgentContext, state: SwarmState) -> dict:
+	return {
+		"sarcastic_output": sarcastic_ape_response(
+			context.model,
+			state["goal"],
+			state["search_context"],
+			chain=context.chain("sarcastic"),
+		),
+	}
+
+
+def _run_builder(context: AgentContext, state: SwarmState) -> dict:
+	selection_note = ""
+	if state["builder_candidates"] <= 1:
+		builder_output = builder_ape_response(
+			model=context.model,
+			goal=state["goal"],
+			sarcastic_context=state["sarcastic_output"],
+			search_context=state["search_context"],
+			chain=context.chain("builder"),
+		)
+	else:
+		specs = _candidate_specs(state["builder_candidates"])
+		models = [context.model_for(provider, temperature) for provider, temperature in specs]
+		candidates = builder_ape_candidates(
+			models=models,
+			goal=state["goal"],
+			sarcastic_context=state["sarcastic_output"],
+			search_context=state["search_context"],
+			chains=[context.chain("builder", candidate_model) for candidate_model in models],
+		)
+		labels = [f"{provider or 'default'}@{temperature}" for provider, temperature in specs]
+		try:
+			verdict = truth_ape_pick_candidate(
+				model=context.model,
 				goal=state["goal"],
-				truth_output=state["truth_output"],
-				iterations=state["self_edit_iterations"],
+				candidates=candidates,
+				search_context=state["search_context"],
+				chain=context.chain("truth_pick"),
 			)
-			self_edit_diff_preview = _build_self_edit_diff_preview(self_edit_output)
-			
-			# Apply patches if write is confirmed
-			if state["allow_git_write"] and state["confirm_self_edit_write"]:
-				patch_count, applied_patches = apply_self_edit_patches(
-					self_edit_output=self_edit_output,
-					repo_root=Path.cwd(),
-					model=model,
+			best_index = verdict.best_index if 0 <= verdict.best_index < len(candidates) else 0
+			scores = {score.index: score for score in verdict.scores}
+			picked = scores.get(best_index)
+			selection_note = (
+				f"TruthApe picked candidate {best_index} ({labels[best_index]}) of {len(candidates)}"
+				+ (f", score {picked.score}/10: {picked.reason}" if picked else "")
+				+ "\n\n"
+				+ "\n".join(
+					f"- {index} ({labels[index]}): {scores[index].score}/10"
+					for index in range(len(candidates))
+					if index in scores
 				)
-				if patch_count > 0:
-					guardrail_note = f"Applied {patch_count} self-edit patches: {', '.join(applied_patches[:3])}"
-					if len(applied_patches) > 3:
-						guardrail_note += f" and {len(applied_patches) - 3} more"
-
-		if state["enable_self_edit"] and state["allow_git_write"] and not state["confirm_self_edit_write"]:
-			guardrail_note = (
-				"Self-edit write request blocked: pass --confirm-self-edit-write together with "
-				"--allow-git-write to permit write-mode while self-edit is enabled."
 			)
-		return {
-			"goal": state["goal"],
-			"active_agent": "GitApe",
-			"allow_git_write": (
-				state["allow_git_write"] and (state["confirm_self_edit_write"] or not state["enable_self_edit"])
-			),
-			"auto_confirm": state["auto_confirm"],
-			"confirm_self_edit_write": state["confirm_self_edit_write"],
-			"enable_self_edit": state["enable_self_edit"],
-			"self_edit_iterations": state["self_edit_iterations"],
-			"sarcastic_output": state["sarcastic_output"],
-			"builder_output": state["builder_output"],
-			"truth_output": state["truth_output"],
-			"self_edit_output": self_edit_output,
-			"self_edit_diff_preview": self_edit_diff_preview,
-			"self_edit_guardrail_note": guardrail_note,
-			"self_edit_applied_patches": applied_patches,
-			"git_output": state["git_output"],
-			"git_exec_output": state["git_exec_output"],
-			"search_context": state["search_context"],
-		}
+		except Exception as error:
+			best_index = 0
+			selection_note = f"Candidate scoring failed ({error}); forwarding candidate 0 ({labels[0]})."
+		builder_output = candidates[best_index]
 
-	def git_ape_node(state: SwarmState) -> SwarmState:
-		git_output = git_ape_response(
-			model=model,
+	return {"builder_output": builder_output, "builder_selection_note": selection_note}
+
+
+def _run_truth(context: AgentContext, state: SwarmState) -> dict:
+	return {
+		"truth_output": truth_ape_response(
+			model=context.model,
 			goal=state["goal"],
-			builder_output=state["builder_output"] + "\n\n" + state["self_edit_output"],
+			builder_output=state["builder_output"],
+			search_context=state["search_context"],
+			chain=context.chain("truth"),
+		),
+	}
+
+
+def _run_self_edit(context: AgentContext, state: SwarmState) -> dict:
+	"""Run one self-edit iteration; the pipeline repeats it while it keeps changing files."""
+	guardrail_note = ""
+	applied_patches = list(state["self_edit_applied_patches"])
+	changed_files = list(state["self_edit_changed_files"])
+	overlay = dict(state["self_edit_overlay"])
+	originals = dict(state["self_edit_originals"])
+	iteration = state["self_edit_iteration"] + 1
+	feedback = ""
+
+	try:
+		plan = self_edit_ape_response(
+			model=context.model,
+			goal=state["goal"],
+			truth_output=state["truth_output"],
+			iterations=state["self_edit_iterations"],
+			iteration=iteration,
+			feedback=state["self_edit_feedback"],
+			search_context=state["search_context"],
+			chain=context.chain("self_edit"),
 		)
-		git_exec_output = execute_git_plan(
-			git_plan_markdown=git_output,
-			repo_root=Path.cwd(),
-			allow_write=state["allow_git_write"],
-			auto_confirm=state["auto_confirm"],
+	except ValueError as exc:
+		# No valid plan after the repair retries: patch nothing this iteration
+		plan = None
+		self_edit_output = f"SelfEditApe returned no valid plan: {exc}"
+	else:
+		self_edit_output = plan.to_markdown()
+	write_patches = state["allow_git_write"] and state["confirm_self_edit_write"]
+	kept_chars = sum(map(len, overlay.values())) + sum(map(len, originals.values()))
+
+	def reserve(rel_path: str, content: str) -> bool:
+		# Refuse a file up front rather than lose its content (or its original) later
+		nonlocal kept_chars
+		if write_patches:
+			cost = 0 if rel_path in originals else len(content)
+		else:
+			cost = len(content) - len(overlay.get(rel_path, ""))
+		if kept_chars + cost > MAX_STATE_MAP_CHARS:
+			return False
+		kept_chars += cost
+		return True
+
+	# Always build the overlay so the preview is a real diff; only write when confirmed
+	patch_result = apply_self_edit_patches(
+		self_edit_output=self_edit_output,
+		repo_root=Path(state["repo_root"]),
+		model=context.model,
+		use_llm=state["self_edit_llm_patch"],
+		dry_run=not write_patches,
+		overlay=overlay,
+		targets=[(target.path, target.action) for target in plan.patch_targets] if plan else [],
+		patch_chain=context.chain("patch"),
+		reserve=reserve,
+	)
+	self_edit_diff_preview = _build_self_edit_diff_preview(patch_result)
+	if state["self_edit_iterations"] > 1:
+		self_edit_diff_preview = (
+			f"Iteration {iteration}/{state['self_edit_iterations']}. {self_edit_diff_preview}"
+		)
+	overlay.update(patch_result["overlay"])
+	for rel_path, content in patch_result["originals"].items():
+		originals.setdefault(rel_path, content)
+	for stat in patch_result["diff_stats"]:
+		if stat["file"] not in changed_files:
+			changed_files.append(stat["file"])
+	patch_count = patch_result["applied_count"]
+	if patch_result["rolled_back"]:
+		guardrail_note = f"Self-edit patches rejected, no files were changed: {patch_result['error']}"
+	else:
+		feedback = _build_iteration_feedback(
+			goal=state["goal"],
+			repo_root=Path(state["repo_root"]),
+			iteration=iteration,
+			patch_result=patch_result,
+			overlay=overlay,
+		)
+		if write_patches and patch_count > 0:
+			new_patches = patch_result["modified_files"]
+			applied_patches.extend(path for path in new_patches if path not in applied_patches)
+			guardrail_note = f"Applied {patch_count} self-edit patches: {', '.join(new_patches[:3])}"
+			if len(new_patches) > 3:
+				guardrail_note += f" and {len(new_patches) - 3} more"
+			patch_ms = sum(t["transform_ms"] + t["write_ms"] for t in patch_result["timings"])
+			guardrail_note += f" ({patch_ms:.1f} ms)"
+
+	if state["self_edit_iterations"] > 1 and not (feedback and iteration < state["self_edit_iterations"]):
+		# Last iteration: show everything the loop changed, not just this step
+		diff, diff_stats = cumulative_diff(Path(state["repo_root"]), changed_files, overlay, originals)
+		self_edit_diff_preview = f"After {iteration} iteration(s), all changes. " + _build_self_edit_diff_preview(
+			{**patch_result, "rolled_back": False, "diff": diff, "diff_stats": diff_stats}
+		)
+
+	if state["allow_git_write"] and not state["confirm_self_edit_write"]:
+		guardrail_note = (
+			"Self-edit write request blocked: pass --confirm-self-edit-write together with "
+			"--allow-git-write to permit write-mode while self-edit is enabled."
 		)
-		return {
-			"goal": state["goal"],
-			"active_agent": "done",
-			"allow_git_write": state["allow_git_write"],
-			"auto_confirm": state["auto_confirm"],
-			"confirm_self_edit_write": state["confirm_self_edit_write"],
-			"enable_self_edit": state["enable_self_edit"],
-			"self_edit_iterations": state["self_edit_iterations"],
-			"sarcastic_output": state["sarcastic_output"],
-			"builder_output": state["builder_output"],
-			"truth_output": state["truth_output"],
-			"self_edit_output": state["self_edit_output"],
-			"self_edit_diff_preview": state["self_edit_diff_preview"],
-			"self_edit_guardrail_note": state["self_edit_guardrail_note"],
-			"self_edit_applied_patches": state["self_edit_applied_patches"],
-			"git_output": git_output,
-			"git_exec_output": git_exec_output,
-			"search_context": state["search_context"],
+	return {
+		"allow_git_write": state["allow_git_write"] and state["confirm_self_edit_write"],
+		"self_edit_output": self_edit_output,
+		"self_edit_diff_preview": self_edit_diff_preview,
+		"self_edit_guardrail_note": guardrail_note,
+		"self_edit_applied_patches": applied_patches,
+		"self_edit_changed_files": changed_files,
+		"self_edit_iteration": iteration,
+		"self_edit_feedback": feedback,
+		"self_edit_overlay": overlay,
+		"self_edit_originals": originals,
+	}
+
+
+def _run_git(context: AgentContext, state: SwarmState) -> dict:
+	try:
+		git_plan = git_ape_response(
+			model=context.model,
+			goal=state["goal"],
+			builder_output=state["builder_output"] + "\n\n" + state["self_edit_output"],
+			search_context=state["search_context"],
+			chain=context.chain("git"),
+		)
+		git_output = git_plan.to_markdown()
+	except ValueError as exc:
+		git_plan = DEFAULT_GIT_PLAN
+		git_output = f"GitApe returned no valid plan, using the default: {exc}\n\n{git_plan.to_markdown()}"
+	git_exec_output = execute_git_plan(
+		git_plan=git_plan,
+		repo_root=Path(state["repo_root"]),
+		allow_write=state["allow_git_write"],
+		auto_confirm=state["auto_confirm"],
+		# Self-edit runs commit exactly the files they patched
+		paths=state["self_edit_applied_patches"] if state["enable_self_edit"] else None,
+	)
+	return {"git_output": git_output, "git_exec_output": git_exec_output}
+
+
+def _self_edit_events(update: dict) -> list[SwarmEvent]:
+	if not update.get("self_edit_output"):
+		return []
+	events: list[SwarmEvent] = [{"agent": "SelfEditApe", "content": update["self_edit_output"]}]
+	if update.get("self_edit_applied_patches"):
+		applied_list = "\n".join(f"- {f}" for f in update["self_edit_applied_patches"])
+		events.append({"agent": "PatchesApplied", "content": f"Applied patches:\n{applied_list}"})
+	return events + field_events(
+		("DiffPreview", "self_edit_diff_preview"),
+		("Guardrail", "self_edit_guardrail_note"),
+	)(update)
+
+
+register_agent(
+	{
+		"name": "sarcastic_ape",
+		"label": "SarcasticApe",
+		"run": _run_sarcastic,
+		"inputs": ["goal", "search_context"],
+		"outputs": ["sarcastic_output"],
+		"chains": ["sarcastic"],
+		"tier": DEFAULT_TIER,
+		"parallel": True,
+		"events": field_events(("SarcasticApe", "sarcastic_output")),
+		"styles": {"SarcasticApe": "bold magenta"},
+	}
+)
+register_agent(
+	{
+		"name": "builder_ape",
+		"label": "BuilderApe",
+		"run": _run_builder,
+		# SarcasticApe guidance is used when present but not required
+		"inputs": ["goal", "search_context", "builder_candidates"],
+		"outputs": ["builder_output", "builder_selection_note"],
+		"chains": ["builder", "truth_pick"],
+		"tier": DEFAULT_TIER,
+		"parallel": True,
+		"events": field_events(("BuilderApe", "builder_output"), ("CandidatePick", "builder_selection_note")),
+		"styles": {"BuilderApe": "bold cyan", "CandidatePick": "bold cyan"},
+	}
+)
+register_agent(
+	{
+		"name": "truth_ape",
+		"label": "TruthApe",
+		"run": _run_truth,
+		"inputs": ["builder_output"],
+		"outputs": ["truth_output"],
+		"chains": ["truth"],
+		"tier": DEFAULT_TIER,
+		"parallel": True,
+		"events": field_events(("TruthApe", "truth_output")),
+		"styles": {"TruthApe": "bold bright_blue"},
+	}
+)
+register_agent(
+	{
+		"name": "self_edit_ape",
+		"label": "SelfEditApe",
+		"run": _run_self_edit,
+		"inputs": ["truth_output", "repo_root"],
+		"outputs": [
+			"allow_git_write",
+			"self_edit_output",
+			"self_edit_diff_preview",
+			"self_edit_guardrail_note",
+			"self_edit_applied_patches",
+			"self_edit_changed_files",
+			"self_edit_iteration",
+			"self_edit_feedback",
+			"self_edit_overlay",
+			"self_edit_originals",
+		],
+		"chains": ["self_edit", "patch"],
+		"tier": DEFAULT_TIER,
+		# Writes files; never shares a stage
+		"parallel": False,
+		"events": _self_edit_events,
+		"styles": {
+			"SelfEditApe": "bold bright_white",
+			"PatchesApplied": "bold bright_green",
+			"DiffPreview": "bold yellow",
+			"Guardrail": "bold red",
+		},
+		# Nothing to patch when TruthApe's handoff is empty or "None"
+		"enabled": lambda state: state["enable_self_edit"] and truth_ape_has_handoff(state["truth_output"]),
+		"skipped": lambda state: {
+			"agent": "Guardrail",
+			"content": "SelfEditApe skipped: TruthApe handed off nothing to change.",
 		}
+		if state["enable_self_edit"]
+		else None,
+		# Loop only while the last iteration changed something and budget remains
+		"repeat": lambda state: bool(state["self_edit_feedback"])
+		and state["self_edit_iteration"] < state["self_edit_iterations"],
+	}
+)
+register_agent(
+	{
+		"name": "git_ape",
+		"label": "GitApe",
+		"run": _run_git,
+		"inputs": ["builder_output", "repo_root"],
+		"outputs": ["git_output", "git_exec_output"],
+		"chains": ["git"],
+		"tier": DEFAULT_TIER,
+		"parallel": True,
+		"events": field_events(("GitApe", "git_output"), ("GitExec", "git_exec_output")),
+		"styles": {"GitExec": "bold bright_green"},
+		# Without a write and without changes GitApe could only draft a plan nobody uses
+		"enabled": lambda state: bool(state["allow_git_write"] or state["self_edit_changed_files"]),
+		"skipped": lambda state: {
+			"agent": "GitExec",
+			"content": "GitApe skipped: no file changes to plan and git write is disabled.",
+		},
+	}
+)
 
-	graph_builder = StateGraph(SwarmState)
-	graph_builder.add_node("sarcastic_ape", sarcastic_ape_node)
-	graph_builder.add_node("builder_ape", builder_ape_node)
-	graph_builder.add_node("truth_ape", truth_ape_node)
-	graph_builder.add_node("self_edit_ape", self_edit_ape_node)
-	graph_builder.add_node("git_ape", git_ape_node)
-	graph_builder.add_edge(START, "sarcastic_ape")
-	graph_builder.add_edge("sarcastic_ape", "builder_ape")
-	graph_builder.add_edge("builder_ape", "truth_ape")
-	graph_builder.add_edge("truth_ape", "self_edit_ape")
-	graph_builder.add_edge("self_edit_ape", "git_ape")
-	graph_builder.add_edge("git_ape", END)
-	return graph_builder.compile(checkpointer=_CHECKPOINTER)
 
+def event_style(agent: str) -> str:
+	"""Rich style for an event label; unknown labels get the default green."""
+	return {**event_styles(), "Metrics": "dim"}.get(agent, "bold green")
 
-def _get_app():
-	global _APP
-	if _APP is None:
-		_APP = _build_app()
-	return _APP
+
+@contextmanager
+def _run_root(repo_root: Path, isolate: bool):
+	"""Yield the directory a run patches and commits in.
+	
+	Runs that write files and commit unattended get a pooled git worktree
+	detached at HEAD, so concurrent runs never touch each other's (or the
+	user's) working tree. Everything else works in place.
+	"""
+	if not isolate:
+		yield repo_root
+		return
+	with get_worktree_pool(repo_root).lease() as worktree_path:
+		yield worktree_path
+
+
+def _get_warm_model(temperature: float | None = None, provider: str | None = None):
+	"""get_model plus a load of local models, so the first ape call does not pay for it."""
+	model = get_model(temperature=temperature, provider=provider)
+	warm_up(model)
+	return model
+
+
+def _get_app(pipeline: str | None = None) -> tuple[object, list[str]]:
+	"""Return the compiled app for a pipeline file and the agents it runs, built once per process."""
+	pipeline = pipeline or os.getenv("APESWARM_PIPELINE", "")
+	key = str(Path(pipeline).resolve()) if pipeline else ""
+	if key not in _APPS:
+		config = load_pipeline(pipeline or None)
+		app = compile_pipeline(
+			config,
+			state_schema=SwarmState,
+			get_model=_get_warm_model,
+			run_inputs=_RUN_INPUTS,
+			checkpointer=_CHECKPOINTER,
+		)
+		_APPS[key] = (app, [name for stage in config.stages for name in stage])
+	return _APPS[key]
 
 
 def execute_swarm(
@@ -262,9 +572,13 @@ def execute_swarm(
 	confirm_self_edit_write: bool = False,
 	enable_self_edit: bool = False,
 	self_edit_iterations: int = 1,
+	self_edit_llm_patch: bool = False,
+	builder_candidates: int = 1,
+	pipeline: str | None = None,
 ) -> tuple[list[SwarmEvent], SwarmState]:
-	app = _get_app()
-	search_context = collect_repo_context(goal=goal, repo_root=Path.cwd())
+	app, agents = _get_app(pipeline)
+	repo_root = Path.cwd()
+	search_context = collect_repo_context(goal=goal, repo_root=repo_root)
 	initial_state: SwarmState = {
 		"goal": goal,
 		"active_agent": "SarcasticApe",
@@ -273,6 +587,9 @@ def execute_swarm(
 		"confirm_self_edit_write": confirm_self_edit_write,
 		"enable_self_edit": enable_self_edit,
 		"self_edit_iterations": max(1, self_edit_iterations),
+		"self_edit_llm_patch": self_edit_llm_patch,
+		"builder_candidates": max(1, builder_candidates),
+		"builder_selection_note": "",
 		"sarcastic_output": "",
 		"builder_output": "",
 		"truth_output": "",
@@ -280,36 +597,53 @@ def execute_swarm(
 		"self_edit_diff_preview": "",
 		"self_edit_guardrail_note": "",
 		"self_edit_applied_patches": [],
+		"self_edit_changed_files": [],
+		"self_edit_iteration": 0,
+		"self_edit_feedback": "",
+		"self_edit_overlay": {},
+		"self_edit_originals": {},
 		"git_output": "",
 		"git_exec_output": "",
 		"search_context": search_context,
+		"repo_root": str(repo_root),
 	}
 
-	config = {"configurable": {"thread_id": thread_id}}
+	usage_metrics = UsageMetrics()
+	# Each self-edit iteration is a graph step; leave room beyond langgraph's default of 25
+	config = {
+		"configurable": {"thread_id": thread_id},
+		"recursion_limit": max(25, initial_state["self_edit_iterations"] + 2 * len(agents) + 5),
+		"callbacks": [usage_metrics],
+	}
+	concurrency = request_concurrency()
+	if concurrency:
+		# Bounds parallel stages and BuilderApe candidates alike
+		config["max_concurrency"] = concurrency
 	events: list[SwarmEvent] = []
-	current_state = initial_state.copy()
-
-	for update in app.stream(initial_state, config=config, stream_mode="updates"):
-		for node_name, patch in update.items():
-			current_state.update(patch)
-			if node_name == "sarcastic_ape" and patch.get("sarcastic_output"):
-				events.append({"agent": "SarcasticApe", "content": patch["sarcastic_output"]})
-			elif node_name == "builder_ape" and patch.get("builder_output"):
-				events.append({"agent": "BuilderApe", "content": patch["builder_output"]})
-			elif node_name == "truth_ape" and patch.get("truth_output"):
-				events.append({"agent": "TruthApe", "content": patch["truth_output"]})
-			elif node_name == "self_edit_ape" and patch.get("self_edit_output"):
-				events.append({"agent": "SelfEditApe", "content": patch["self_edit_output"]})
-				if patch.get("self_edit_applied_patches"):
-					applied_list = "\n".join(f"- {f}" for f in patch["self_edit_applied_patches"])
-					events.append({"agent": "PatchesApplied", "content": f"Applied patches:\n{applied_list}"})
-				if patch.get("self_edit_diff_preview"):
-					events.append({"agent": "DiffPreview", "content": patch["self_edit_diff_preview"]})
-				if patch.get("self_edit_guardrail_note"):
-					events.append({"agent": "Guardrail", "content": patch["self_edit_guardrail_note"]})
-			elif node_name == "git_ape" and patch.get("git_output"):
-				events.append({"agent": "GitApe", "content": patch["git_output"]})
-				if patch.get("git_exec_output"):
-					events.append({"agent": "GitExec", "content": patch["git_exec_output"]})
+	# Every run re-seeds the full state, so older checkpoints of this thread are never read;
+	# dropping them keeps a long-lived process from holding every past run's outputs
+	_CHECKPOINTER.delete_thread(thread_id)
+
+	isolate = allow_git_write and auto_confirm and enable_self_edit and confirm_self_edit_write
+	with _run_root(repo_root, isolate) as run_root:
+		initial_state["repo_root"] = str(run_root)
+		current_state = initial_state.copy()
+		ran: set[str] = set()
+		for update in app.stream(initial_state, config=config, stream_mode="updates"):
+			for node_name, patch in update.items():
+				# Join nodes of parallel stages carry no update
+				if not patch or node_name not in AGENT_SPECS:
+					continue
+				ran.add(node_name)
+				current_state.update(patch)
+				events.extend(AGENT_SPECS[node_name]["events"](patch))
+
+	for name in agents:
+		skipped = AGENT_SPECS[name].get("skipped")
+		event = skipped(current_state) if skipped and name not in ran else None
+		if event:
+			events.append(event)
+	current_state["active_agent"] = "done"
 
+	events.append({"agent": "Metrics", "content": usage_metrics.summary()})
 	return events, current_state
\ No newline at end of file
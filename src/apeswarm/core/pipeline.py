@@ -0,0 +1,225 @@
+"""Declarative ape pipelines: agents register a spec, a TOML file orders them into stages."""
+from importlib import resources
+from pathlib import Path
+import tomllib
+from typing import Callable, NotRequired, TypedDict
+
+from langgraph.graph import END, START, StateGraph
+from pydantic import BaseModel, Field
+
+from apeswarm.agents import AgentRegistry
+
+DEFAULT_PIPELINE = resources.files("apeswarm") / "pipelines" / "default.toml"
+DEFAULT_TIER = "default"
+# Text an agent writes into state (and the events built from it) is cut beyond this
+MAX_STATE_TEXT_CHARS = 200_000
+# Total text an agent may keep in mappings of texts (e.g. file contents by path).
+# Agents enforce it themselves, before they act, and report what they could not keep
+MAX_STATE_MAP_CHARS = 4_000_000
+
+
+class AgentContext:
+	"""What a node gets besides state: its tier's model, compiled chains and other models on demand."""
+
+	def __init__(self, model, registry: AgentRegistry, models: dict, get_model: Callable):
+		self.model = model
+		self.registry = registry
+		self._models = models
+		self._get_model = get_model
+
+	def model_for(self, provider: str | None = None, temperature: float | None = None):
+		"""Return the shared model for ``(provider, temperature)``, creating it once."""
+		key = (provider, temperature)
+		if key not in self._models:
+			self._models[key] = self._get_model(temperature=temperature, provider=provider)
+		return self._models[key]
+
+	def chain(self, name: str, model=None):
+		return self.registry.chain(name, model if model is not None else self.model)
+
+
+class AgentSpec(TypedDict):
+	name: str
+	label: str
+	run: Callable[[AgentContext, dict], dict]
+	# State keys the agent needs from an earlier stage (or the run inputs)
+	inputs: list[str]
+	outputs: list[str]
+	# AgentRegistry chains compiled for the agent's model at build time
+	chains: list[str]
+	tier: str
+	# May share a stage with other agents
+	parallel: bool
+	events: Callable[[dict], list[dict]]
+	styles: dict[str, str]
+	# Routed around when false
+	enabled: NotRequired[Callable[[dict], bool]]
+	# Run again right away while true (single-agent stages only)
+	repeat: NotRequired[Callable[[dict], bool]]
+	# Event for the final state when the agent is in the pipeline but never ran (None: say nothing)
+	skipped: NotRequired[Callable[[dict], dict | None]]
+
+
+class TierConfig(BaseModel):
+	provider: str | None = None
+	temperature: float | None = None
+
+
+class AgentConfig(BaseModel):
+	tier: str | None = None
+
+
+class PipelineConfig(BaseModel):
+	stages: list[list[str]] = Field(min_length=1)
+	tiers: dict[str, TierConfig] = Field(default_factory=dict)
+	agents: dict[str, AgentConfig] = Field(default_factory=dict)
+
+
+AGENT_SPECS: dict[str, AgentSpec] = {}
+
+
+def register_agent(spec: AgentSpec) -> AgentSpec:
+	"""Make an agent available to pipeline files under ``spec["name"]``."""
+	AGENT_SPECS[spec["name"]] = spec
+	return spec
+
+
+def field_events(*pairs: tuple[str, str]) -> Callable[[dict], list[dict]]:
+	"""Events for a node update: one per (event label, state key) whose value is non-empty."""
+
+	def events(update: dict) -> list[dict]:
+		return [{"agent": label, "content": update[key]} for label, key in pairs if update.get(key)]
+
+	return events
+
+
+def event_styles(specs: dict[str, AgentSpec] | None = None) -> dict[str, str]:
+	styles: dict[str, str] = {}
+	for spec in (specs or AGENT_SPECS).values():
+		styles.update(spec["styles"])
+	return styles
+
+
+def load_pipeline(path: str | Path | None = None) -> PipelineConfig:
+	"""Read a pipeline TOML file, the bundled default when ``path`` is empty."""
+	source = Path(path) if path else DEFAULT_PIPELINE
+	with source.open("rb") as handle:
+		return PipelineConfig.model_validate(tomllib.load(handle))
+
+
+def validate_pipeline(config: PipelineConfig, specs: dict[str, AgentSpec], run_inputs: set[str]) -> None:
+	"""Raise ValueError for pipelines that would misbehave at run time rather than at build time."""
+	seen: set[str] = set()
+	available = set(run_inputs)
+	for index, stage in enumerate(config.stages):
+		if not stage:
+			raise ValueError(f"Pipeline stage {index} lists no agents")
+		stage_outputs: set[str] = set()
+		for name in stage:
+			if name not in specs:
+				raise ValueError(f"Unknown agent {name!r} in pipeline; registered: {', '.join(sorted(specs))}")
+			if name in seen:
+				raise ValueError(f"Agent {name!r} appears more than once in the pipeline")
+			seen.add(name)
+			spec = specs[name]
+			missing = [key for key in spec["inputs"] if key not in available]
+			if missing:
+				raise ValueError(f"{name} reads {', '.join(missing)}, which no earlier stage writes")
+			if len(stage) > 1:
+				if not spec["parallel"] or "repeat" in spec:
+					raise ValueError(f"{name} cannot share a stage with other agents")
+				overlap = stage_outputs & set(spec["outputs"])
+				if overlap:
+					raise ValueError(f"Parallel stage {index} writes {', '.join(sorted(overlap))} more than once")
+			stage_outputs |= set(spec["outputs"])
+		available |= stage_outputs
+	for name, agent in config.agents.items():
+		if name not in seen:
+			raise ValueError(f"[agents.{name}] configures an agent that is not in any stage")
+		if agent.tier and agent.tier != DEFAULT_TIER and agent.tier not in config.tiers:
+			raise ValueError(f"{name} uses undefined tier {agent.tier!r}")
+
+
+def compile_pipeline(
+	config: PipelineConfig,
+	state_schema: type,
+	get_model: Callable,
+	run_inputs: set[str],
+	specs: dict[str, AgentSpec] | None = None,
+	checkpointer=None,
+):
+	"""Compile ``config`` into a StateGraph app.
+
+	Stages run in order. A stage with several agents fans out and joins
+	before the next stage. After each stage the router skips stages whose
+	agents are all disabled for this state, or repeats a single agent while
+	its ``repeat`` predicate holds. Every agent's chains are compiled for its
+	tier's model here, once.
+	"""
+	specs = specs or AGENT_SPECS
+	validate_pipeline(config, specs, run_inputs)
+	registry = AgentRegistry()
+	models: dict = {}
+	graph_builder = StateGraph(state_schema)
+
+	def tier_model(tier: str):
+		tier_config = config.tiers.get(tier, TierConfig())
+		key = (tier_config.provider, tier_config.temperature)
+		if key not in models:
+			models[key] = get_model(temperature=tier_config.temperature, provider=tier_config.provider)
+		return models[key]
+
+	exits: list[str] = []
+	for index, stage in enumerate(config.stages):
+		for name in stage:
+			spec = specs[name]
+			agent_config = config.agents.get(name)
+			model = tier_model((agent_config and agent_config.tier) or spec["tier"])
+			registry.compile(model, names=spec["chains"])
+			graph_builder.add_node(name, _agent_node(spec, AgentContext(model, registry, models, get_model)))
+		if len(stage) == 1:
+			exits.append(stage[0])
+			continue
+		join = f"join_stage_{index}"
+		graph_builder.add_node(join, lambda state: {})
+		for name in stage:
+			graph_builder.add_edge(name, join)
+		exits.append(join)
+
+	destinations = [name for stage in config.stages for name in stage] + [END]
+	graph_builder.add_conditional_edges(START, _stage_router(config.stages, specs, -1), destinations)
+	for index, exit_node in enumerate(exits):
+		graph_builder.add_conditional_edges(exit_node, _stage_router(config.stages, specs, index), destinations)
+	return graph_builder.compile(checkpointer=checkpointer)
+
+
+def _bounded(update: dict) -> dict:
+	bounded = {}
+	for key, value in update.items():
+		if isinstance(value, str) and len(value) > MAX_STATE_TEXT_CHARS:
+			omitted = len(value) - MAX_STATE_TEXT_CHARS
+			value = value[:MAX_STATE_TEXT_CHARS] + f"\n\n... ({omitted} more characters truncated)"
+		bounded[key] = value
+	return bounded
+
+
+def _agent_node(spec: AgentSpec, context: AgentContext):
+	def node(state: dict) -> dict:
+		return {**_bounded(spec["run"](context, state)), "active_agent": spec["label"]}
+
+	return node
+
+
+def _stage_router(stages: list[list[str]], specs: dict[str, AgentSpec], index: int):
+	def route(state: dict):
+		if index >= 0 and len(stages[index]) == 1:
+			repeat = specs[stages[index][0]].get("repeat")
+			if repeat is not None and repeat(state):
+				return stages[index]
+		for stage in stages[index + 1:]:
+			enabled = [name for name in stage if specs[name].get("enabled", lambda _: True)(state)]
+			if enabled:
+				return enabled
+		return END
+
+	return route
\ No newline at end of file
@@ -1,5 +1,15 @@
+import io
+import os
 from pathlib import Path
 import re
+from typing import Iterable
+
+# Only the head of each file is scanned, so a huge generated file costs no more than this
+_MAX_FILE_BYTES = 2_000_000
+# Longer (minified) lines are matched on their head and the rest is skipped in chunks
+_MAX_LINE_BYTES = 4_096
+# Hit lines are quoted into every ape prompt
+_MAX_HIT_CHARS = 240
 
 
 def _extract_keywords(goal: str) -> list[str]:
@@ -8,6 +18,54 @@ def _extract_keywords(goal: str) -> list[str]:
 	return filtered[:8]
 
 
+def _collect_hits(rel: str, lines: Iterable[str], keywords: list[str], hits: list[str], max_hits: int) -> None:
+	for idx, line in enumerate(lines, start=1):
+		line_lower = line.lower()
+		if any(keyword in line_lower for keyword in keywords):
+			hits.append(f"{rel}:{idx}: {line.strip()[:_MAX_HIT_CHARS]}")
+			if len(hits) >= max_hits:
+				break
+
+
+def _iter_file_lines(file_path: Path, max_bytes: int = _MAX_FILE_BYTES):
+	"""Stream decoded lines from the first ``max_bytes`` of a file.
+	
+	At most one line head of ``_MAX_LINE_BYTES`` is held at a time; the
+	tail of an overlong line is read in bounded chunks and dropped.
+	"""
+	budget = max_bytes
+	with file_path.open("rb") as handle:
+		while budget > 0:
+			line = handle.readline(min(_MAX_LINE_BYTES, budget))
+			if not line:
+				return
+			budget -= len(line)
+			if not line.endswith(b"\n"):
+				while budget > 0:
+					rest = handle.readline(min(_MAX_LINE_BYTES, budget))
+					budget -= len(rest)
+					if not rest or rest.endswith(b"\n"):
+						break
+			yield line.decode("utf-8", errors="ignore")
+
+
+# A worktree's .git is a file pointing at the main checkout, so files are matched too
+_SKIPPED_NAMES = {".git", "__pycache__"}
+
+
+def iter_repo_files(repo_root: Path):
+	# Pruned, never entered: .git holds the objects and every pooled worktree checkout.
+	# Only directories below repo_root are pruned, so a leased worktree under .git/ still walks
+	for dir_path, dir_names, file_names in os.walk(repo_root):
+		dir_names[:] = [name for name in dir_names if name not in _SKIPPED_NAMES]
+		for file_name in file_names:
+			if file_name in _SKIPPED_NAMES:
+				continue
+			file_path = Path(dir_path, file_name)
+			if file_path.is_file():
+				yield file_path
+
+
 def collect_repo_context(goal: str, repo_root: Path, max_hits: int = 20) -> str:
 	keywords = _extract_keywords(goal)
 	if not keywords:
@@ -16,28 +74,33 @@ def collect_repo_context(goal: str, repo_root: Path, max_hits: int = 20) -> str:
 	allowed_suffixes = {".py", ".md", ".toml", ".yml", ".yaml", ".txt"}
 	hits: list[str] = []
 
-	for file_path in repo_root.rglob("*"):
+	for file_path in iter_repo_files(repo_root):
 		if len(hits) >= max_hits:
 			break
-		if not file_path.is_file():
-			continue
-		if ".git" in file_path.parts or "__pycache__" in file_path.parts:
-			continue
 		if file_path.suffix and file_path.suffix.lower() not in allowed_suffixes:
 			continue
 		try:
-			content = file_path.read_text(encoding="utf-8", errors="ignore")
+			_collect_hits(str(file_path.relative_to(repo_root)), _iter_file_lines(file_path), keywords, hits, max_hits)
 		except OSError:
 			continue
-		lines = content.splitlines()
-		for idx, line in enumerate(lines, start=1):
-			line_lower = line.lower()
-			if any(keyword in line_lower for keyword in keywords):
-				rel = file_path.relative_to(repo_root)
-				hits.append(f"{rel}:{idx}: {line.strip()}")
-				if len(hits) >= max_hits:
-					break
 
 	if not hits:
 		return "No repository matches found for extracted keywords."
+	return "\n".join(hits)
+
+
+def collect_file_context(goal: str, files: dict[str, str], max_hits: int = 10) -> str:
+	"""Like collect_repo_context, but only over the given path -> content map."""
+	keywords = _extract_keywords(goal)
+	if not keywords:
+		return "No keywords extracted from goal."
+
+	hits: list[str] = []
+	for rel, content in files.items():
+		if len(hits) >= max_hits:
+			break
+		_collect_hits(rel, io.StringIO(content), keywords, hits, max_hits)
+
+	if not hits:
+		return "No matches found in the given files for extracted keywords."
 	return "\n".join(hits)
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""Pooled git worktrees so concurrent write-mode runs never share a working tree."""
+from contextlib import contextmanager
+import atexit
+import itertools
+import os
+from pathlib import Path
+import threading
+
+from git import GitCommandError, Repo
+
+try:
+	import fcntl
+except ImportError:  # Windows: leases are only exclusive within this process
+	fcntl = None
+
+_POOL_DIR_NAME = "apeswarm-worktrees"
+_DEFAULT_MAX_IDLE = 4
+
+
+class WorktreePool:
+	"""Lease detached worktrees of one clone, reusing idle ones between runs.
+
+	Worktrees live under ``<git common dir>/apeswarm-worktrees`` so they never
+	show up as untracked files in the main checkout. Each lease holds an
+	``flock`` on a sibling lock file, which makes leases exclusive across
+	processes and releases them automatically if a run dies.
+	"""
+
+	def __init__(self, repo_root: Path, max_idle: int = _DEFAULT_MAX_IDLE):
+		self.repo = Repo(repo_root, search_parent_directories=True)
+		self.base_dir = Path(self.repo.common_dir) / _POOL_DIR_NAME
+		self.max_idle = max_idle
+		self._lock = threading.Lock()
+		self._leases: dict[Path, object] = {}
+		self._counter = itertools.count()
+		self.base_dir.mkdir(exist_ok=True)
+		# Forget registrations whose directories were deleted by hand
+		self.repo.git.worktree("prune")
+
+	def _try_lock(self, worktree_path: Path):
+		handle = open(worktree_path.with_suffix(".lock"), "a+")
+		if fcntl is not None:
+			try:
+				fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except OSError:
+				handle.close()
+				return None
+		return handle
+
+	def _idle_candidates(self) -> list[Path]:
+		return sorted(
+			path for path in self.base_dir.iterdir()
+			if path.is_dir() and (path / ".git").exists() and path not in self._leases
+		)
+
+	def acquire(self) -> Path:
+		"""Return a clean worktree detached at the current HEAD of the clone."""
+		head = self.repo.git.rev_parse("HEAD")
+		with self._lock:
+			for candidate in self._idle_candidates():
+				handle = self._try_lock(candidate)
+				if handle is None:
+					continue
+				try:
+					worktree_git = Repo(candidate).git
+					worktree_git.checkout("--detach", "--force", head)
+					worktree_git.clean("-fd")
+				except GitCommandError:
+					handle.close()
+					self._remove(candidate)
+					continue
+				self._leases[candidate] = handle
+				return candidate
+
+			worktree_path = self.base_dir / f"wt-{os.getpid()}-{next(self._counter)}"
+			handle = self._try_lock(worktree_path)
+			try:
+				self.repo.git.worktree("add", "--detach", str(worktree_path), head)
+			except GitCommandError:
+				handle.close()
+				worktree_path.with_suffix(".lock").unlink(missing_ok=True)
+				raise
+			self._leases[worktree_path] = handle
+			return worktree_path
+
+	def release(self, worktree_path: Path) -> None:
+		"""Detach the worktree (freeing its branch) and keep it for reuse or remove it."""
+		with self._lock:
+			handle = self._leases.pop(worktree_path, None)
+			try:
+				Repo(worktree_path).git.checkout("--detach")
+			except GitCommandError:
+				pass
+			if len(self._idle_candidates()) > self.max_idle:
+				self._remove(worktree_path)
+			if handle is not None:
+				handle.close()
+
+	def _remove(self, worktree_path: Path) -> None:
+		try:
+			self.repo.git.worktree("remove", "--force", str(worktree_path))
+		except GitCommandError:
+			pass
+		worktree_path.with_suffix(".lock").unlink(missing_ok=True)
+
+	def close(self) -> None:
+		"""Remove every idle worktree this pool can lock."""
+		with self._lock:
+			for candidate in self._idle_candidates():
+				handle = self._try_lock(candidate)
+				if handle is None:
+					continue
+				handle.close()
+				self._remove(candidate)
+
+	@contextmanager
+	def lease(self):
+		worktree_path = self.acquire()
+		try:
+			yield worktree_path
+		finally:
+			self.release(worktree_path)
+
+
+_POOLS: dict[Path, WorktreePool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_worktree_pool(repo_root: Path) -> WorktreePool:
+	"""Return the process-wide pool for the clone containing ``repo_root``."""
+	repo = Repo(repo_root, search_parent_directories=True)
+	key = Path(repo.common_dir).resolve()
+	with _POOLS_LOCK:
+		if key not in _POOLS:
+			_POOLS[key] = WorktreePool(repo_root)
+		return _POOLS[key]
+
+
+@atexit.register
+def _close_pools() -> None:
+	for pool in _POOLS.values():
+		pool.close()